@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+import enum
+
+class BuildBackend(enum.Enum):
+    """生成するビルドファイル
+    Make : Makefile
+    Ninja: build.ninja"""
+    Make  = 'make'
+    Ninja = 'ninja'
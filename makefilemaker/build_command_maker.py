@@ -26,13 +26,34 @@ class BuildCommandMaker:
         # library設定
         #   {library_name: library_dir, ...}
         self._libdir_setting  = OrderedDict()
+        # library設定の索引
+        #   {target_library: library設定の順番, ...}
+        self._library_index = None
+        # プリコンパイル済みヘッダ
+        #   {source_path: PrecompiledHeader, ...}
+        self._precompiled_header = {}
+        # 生成したcommandの基本部分
+        #   {(command_type, include_libs): command_base, ...}
+        #   設定が変更された時に破棄する
+        self._command_cache = {}
         # verbose mode
         self._verbose = verbose
     
+    @property
+    def compiler_setting(self):
+        """CompilerSettingを返す"""
+        return self._compiler_setting
+    
+    @property
+    def include_setting(self):
+        """include設定を返す ((target_library, include_path), ...)"""
+        return tuple(self._include_setting.items())
+    
     def update_compiler(self, compiler_setting):
         """CommpilerSettingを更新
         commpiler_setting: CommpilerSettting"""
         self._compiler_setting = compiler_setting
+        self.clear_cache()
     
     def add_include_setting(self, include_path, target_header):
         """include設定を読み込む
@@ -49,6 +70,7 @@ class BuildCommandMaker:
         # 設定
         for target in target_header:
             self._include_setting[target] = path
+        self.clear_cache()
         # 表示
         if self._verbose:
             print('Update IncludeSetting')
@@ -78,6 +100,7 @@ class BuildCommandMaker:
             self._library_setting[None].extend(lib_list)
         for target in target_header:
             self._library_setting[target] = tuple(lib_list)
+        self.clear_cache()
         # 表示
         if self._verbose:
             print('Update LibrarySetting')
@@ -89,17 +112,133 @@ class BuildCommandMaker:
     # ToDo
     # def add_library_path_setting(self, target_lib, library_path):
     
+    def clear_cache(self):
+        """設定から生成したcommandのcacheを破棄"""
+        self._library_index = None
+        self._command_cache.clear()
+    
+    def library_index(self):
+        """library設定の索引 {target_library: library設定の順番, ...}"""
+        if self._library_index is None:
+            self._library_index = dict(
+                        (target, i) for i, target
+                        in enumerate(self._library_setting.keys())
+                        if not target is None)
+        return self._library_index
+    
+    def include_path_list(self):
+        """include設定のpathを設定順に重複を除いて返す"""
+        result = []
+        for include_path in self._include_setting.values():
+            if not include_path in result:
+                result.append(include_path)
+        return tuple(result)
+    
+    def include_option(self, include_libs, code_dir= None, dir= None):
+        """依存しているlibraryに対するincludeオプション
+        相対パスのinclude設定はコードのディレクトリからのパスとし、
+        コマンドを実行するディレクトリが異なる場合はそこからのパスに変換する
+        include_libs: 依存しているlibrary
+        code_dir    : コードのディレクトリ Noneならば変換しない
+        dir         : コマンドを実行するディレクトリ Noneならば変換しない
+        return (option, ...)"""
+        include_path_list = []
+        include_path_set  = set()
+        for lib in include_libs:
+            include_path = self._include_setting.get(lib)
+            if include_path is None or include_path in include_path_set:
+                continue
+            include_path_list.append(include_path)
+            include_path_set.add(include_path)
+        base_dir = include_base_dir(code_dir, dir)
+        return tuple('{0}{1}'.format(
+                            self._compiler_setting.option.include_path,
+                            include_path.as_posix()
+                                if base_dir is None
+                                   or include_path.is_absolute()
+                                else path_to_string(
+                                        base_dir[0].joinpath(include_path),
+                                        base_dir[1]))
+                     for include_path in include_path_list)
+    
+    def compile_template(self, include_libs, code_dir= None, dir= None):
+        """コンパイル時のcommandの基本部分
+        依存しているlibrary, include設定の基準となるディレクトリ毎に
+        生成結果を再利用する
+        include_libs: 依存しているlibrary
+        code_dir    : コードのディレクトリ
+        dir         : コマンドを実行するディレクトリ"""
+        key = ('compile', tuple(include_libs),
+               include_base_dir(code_dir, dir))
+        if not key in self._command_cache:
+            self._command_cache[key] = compile_command_base(
+                        self, include_libs, code_dir, dir)
+        return self._command_cache[key]
+    
+    def link_template(self, include_libs):
+        """オブジェクトリンク時のcommandの基本部分
+        依存しているlibrary毎に生成結果を再利用する
+        include_libs: 依存しているlibrary"""
+        key = ('link', tuple(include_libs))
+        if not key in self._command_cache:
+            self._command_cache[key] = link_command_base(self, include_libs)
+        return self._command_cache[key]
+    
+    def set_precompiled_header(self, precompiled_header_list):
+        """プリコンパイル済みヘッダを設定
+        precompiled_header_list: (PrecompiledHeader, ...)"""
+        self._precompiled_header = dict(
+                    (source_path, precompiled_header)
+                    for precompiled_header in precompiled_header_list
+                    for source_path in precompiled_header.source_list)
+    
+    def precompiled_header(self, build_data):
+        """ソースコードが使用するプリコンパイル済みヘッダ
+        return PrecompiledHeader 使用しなければNone"""
+        return self._precompiled_header.get(build_data.source_path)
+    
+    def precompiled_header_option(self, build_data, dir):
+        """プリコンパイル済みヘッダを使用するオプション
+        build_data:
+        dir       : コマンドを実行するディレクトリ
+        return -include <header> 使用しなければNone"""
+        precompiled_header = self.precompiled_header(build_data)
+        if precompiled_header is None:
+            return None
+        return '-include {0}'.format(
+                    path_to_string(precompiled_header.header_path, dir))
+    
+    def precompile_command_makefile_macro(self, precompiled_header, dir= None):
+        """プリコンパイル済みヘッダを作成するためのコマンドを作成
+            Makefileのマクロを使用
+        precompiled_header: PrecompiledHeader
+        dir               : コマンドを実行するディレクトリ
+                              Default pathlib.Path(sys.argv[0]).parent.resolve()"""
+        if dir == None: dir = pathlib.Path(sys.argv[0]).parent.resolve()
+        command_base = self.compile_template(
+                    precompiled_header.include_libs,
+                    precompiled_header.header_path.parent,
+                    dir)
+        command = command_base.format(
+                    output= MakefileMacro.output.value,
+                    code=   path_to_string(precompiled_header.header_path,
+                                           dir))
+        return command
+    
     def compile_command(self, build_data, dir= None):
         """コードをコンパイルするためのコマンドを作成
         build_data:
         dir       : コマンドを実行するディレクトリ
                       Default pathlib.Path(sys.argv[0]).parent.resolve()"""
         if dir == None: dir = pathlib.Path(sys.argv[0]).parent.resolve()
-        command_base = compile_command_base(self, build_data.include_libs)
+        command_base = self.compile_template(build_data.include_libs,
+                                             build_data.source_path.parent,
+                                             dir)
         command = command_base.format(
                     output= path_to_string(build_data.object_path, dir),
                     code=   path_to_string(build_data.source_path, dir))
-        return command
+        return append_option(command,
+                             self.precompiled_header_option(build_data, dir))
     
     def compile_command_makefile_macro(self, build_data, dir= None):
         """コードをコンパイルするためのコマンドを作成
@@ -108,11 +247,14 @@ class BuildCommandMaker:
         dir       : コマンドを実行するディレクトリ
                       Default pathlib.Path(sys.argv[0]).parent.resolve()"""
         if dir == None: dir = pathlib.Path(sys.argv[0]).parent.resolve()
-        command_base = compile_command_base(self, build_data.include_libs)
+        command_base = self.compile_template(build_data.include_libs,
+                                             build_data.source_path.parent,
+                                             dir)
         command = command_base.format(
                     output= MakefileMacro.output.value,
                     code=   path_to_string(build_data.source_path, dir))
-        return command
+        return append_option(command,
+                             self.precompiled_header_option(build_data, dir))
     
     def link_command(self, build_data, dir= None):
         """オブジェクトをリンクするためのコマンドを作成
@@ -120,7 +262,7 @@ class BuildCommandMaker:
         dir       : コマンドを実行するディレクトリ
                       Default pathlib.Path(sys.argv[0]).parent.resolve()"""
         if dir == None: dir = pathlib.Path(sys.argv[0]).parent.resolve()
-        command_base = link_command_base(self, build_data.include_libs)
+        command_base = self.link_template(build_data.include_libs)
         object_list = ' '.join(path_to_string(object_path, dir)
                                for object_path in build_data.link_objects)
         command = command_base.format(
@@ -135,15 +277,30 @@ class BuildCommandMaker:
         dir       : コマンドを実行するディレクトリ
                       Default pathlib.Path(sys.argv[0]).parent.resolve()"""
         if dir == None: dir = pathlib.Path(sys.argv[0]).parent.resolve()
-        command_base = link_command_base(self, build_data.include_libs)
+        command_base = self.link_template(build_data.include_libs)
         command = command_base.format(
                     output= MakefileMacro.output.value,
                     target= MakefileMacro.target.value)
         return command
 
-def compile_command_base(self, include_libs= []):
+def append_option(command, option):
+    """commandの末尾にオプションを追加 optionがNoneならばそのまま"""
+    if option is None:
+        return command
+    return '{0} {1}'.format(command, option)
+
+def include_base_dir(code_dir, dir):
+    """include設定の相対パスを変換する基準
+    return (code_dir, dir) 変換しなければNone"""
+    if code_dir is None or dir is None or code_dir == dir:
+        return None
+    return (code_dir, dir)
+
+def compile_command_base(self, include_libs= [], code_dir= None, dir= None):
     """コンパイル時のcommandの基本部分を作成
     include_libs: 依存しているlibrary
+    code_dir    : コードのディレクトリ
+    dir         : コマンドを実行するディレクトリ
     <compiler> <output_option> {output} {target} <notlink_option>
         <include_setting>"""
     command = []
@@ -159,14 +316,7 @@ def compile_command_base(self, include_libs= []):
     # コンパイルオプション
     command.extend(self._compiler_setting.option_list)
     # インクルード設定
-    include_path_list = []
-    for lib in (lib for lib in include_libs
-                if lib in self._include_setting.keys()):
-        if not self._include_setting[lib] in include_path_list:
-            include_path_list.append(self._include_setting[lib])
-    command.extend('{0}{1}'.format(self._compiler_setting.option.include_path,
-                                   include_path.as_posix())
-                   for include_path in include_path_list)
+    command.extend(self.include_option(include_libs, code_dir, dir))
     # comamnd結合
     return ' '.join(command)
 
@@ -183,14 +333,17 @@ def link_command_base(self, include_libs):
     # オブジェクト指定
     command.append('{target}')
     # ライブラリ指定
+    #   library設定の順番に並べる
+    library_index = self.library_index()
     lib_set = set()
-    for target in self._library_setting.keys():
-        if target in include_libs:
-            command.extend('{0}{1}'.format(
-                        self._compiler_setting.option.library, lib)
-                        for lib in self._library_setting[target]
-                        if not lib in lib_set)
-            lib_set.update(self._library_setting[target])
+    for target in sorted(set(lib for lib in include_libs
+                             if lib in library_index),
+                         key= library_index.get):
+        command.extend('{0}{1}'.format(
+                    self._compiler_setting.option.library, lib)
+                    for lib in self._library_setting[target]
+                    if not lib in lib_set)
+        lib_set.update(self._library_setting[target])
     #   全適用ライブラリ
     if None in self._library_setting.keys():
         command.extend('{0}{1}'.format(
@@ -3,3 +3,4 @@
 from .code_data import CodeDependence
 from .code_tree import CodeTree
 from .main import CodeManager
+from .scanner import Scanner
@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+
+from .code_data import CodeDependence
+from ..path_function import path_sort
+
+class ClosureEngine:
+    """依存関係のgraphを強連結成分に縮約し、
+    各成分が推移的に依存するファイル, ライブラリを一度だけ計算する
+    計算結果は全てのソースコードで共有される"""
+    
+    def __init__(self, dependence_list):
+        """コンストラクタ
+        dependence_list: 依存性解析結果集 {code_path: CodeDependence, ...}"""
+        self._dependence_list = dependence_list
+        # 各codeが属する強連結成分の番号
+        #   {code_path: component_index, ...}
+        self._component_index = {}
+        # 各強連結成分が推移的に依存するファイル, ライブラリ
+        self._component_files = []
+        self._component_libs  = []
+        self.build()
+    
+    def build(self):
+        """強連結成分毎に推移的な依存を計算
+        強連結成分は依存される側から順に得られるため、
+        依存先の成分の計算結果を再利用できる"""
+        def successors(code_path):
+            dependence = self._dependence_list.get(code_path)
+            return () if dependence is None else dependence.include_files
+        for component in strongly_connected_components(
+                    self._dependence_list.keys(), successors):
+            index = len(self._component_files)
+            include_files = set()
+            include_libs  = set()
+            for code_path in component:
+                self._component_index[code_path] = index
+            for code_path in component:
+                dependence = self._dependence_list.get(code_path)
+                if dependence is None:
+                    continue
+                include_files.update(dependence.include_files)
+                include_libs.update(dependence.include_libs)
+                for file in dependence.include_files:
+                    file_index = self._component_index[file]
+                    if file_index != index:
+                        include_files.update(
+                                    self._component_files[file_index])
+                        include_libs.update(
+                                    self._component_libs[file_index])
+            self._component_files.append(frozenset(include_files))
+            self._component_libs.append(frozenset(include_libs))
+    
+    def full_dependence(self, source_path):
+        """sourceが依存しているファイルを全て纏める
+        source_path: 対象とするsourceのpath"""
+        index = self._component_index[source_path]
+        return CodeDependence(
+                    source_path,
+                    tuple(sorted(self._component_files[index], key= path_sort)),
+                    tuple(sorted(self._component_libs[index])))
+
+def strongly_connected_components(node_list, successors):
+    """Tarjanのアルゴリズムで強連結成分を求める
+    再帰を用いないため、深い依存関係でも再帰上限に達しない
+    node_list : graphのノード
+    successors: ノードを受け取り、その依存先を返す関数
+    return [[node, ...], ...] 依存される側の成分から順に並ぶ"""
+    index_list   = {}
+    lowlink_list = {}
+    stack    = []
+    on_stack = set()
+    result   = []
+    for root in node_list:
+        if root in index_list:
+            continue
+        index_list[root] = lowlink_list[root] = len(index_list)
+        stack.append(root)
+        on_stack.add(root)
+        work_list = [(root, iter(successors(root)))]
+        while len(work_list) != 0:
+            node, successor_iter = work_list[-1]
+            for successor in successor_iter:
+                if not successor in index_list:
+                    # 未訪問のノードを探索
+                    index_list[successor] = len(index_list)
+                    lowlink_list[successor] = index_list[successor]
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work_list.append((successor, iter(successors(successor))))
+                    break
+                elif successor in on_stack:
+                    lowlink_list[node] = min(lowlink_list[node],
+                                             index_list[successor])
+            else:
+                # 全ての依存先を探索し終えた
+                work_list.pop()
+                if len(work_list) != 0:
+                    parent = work_list[-1][0]
+                    lowlink_list[parent] = min(lowlink_list[parent],
+                                               lowlink_list[node])
+                if lowlink_list[node] == index_list[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    result.append(component)
+    return result
@@ -27,8 +27,16 @@ class CodeTree:
         self._root_code = root_code
         # 除外対象
         self._exceptions = tuple(sorted(exceptions, key= path_sort))
+        self._exception_set = frozenset(self._exceptions)
         # 木構造データ
-        self._node_data = []
+        #   {node_path: CodeTreeNode, ...} 追加された順
+        self._node_data = {}
+        # 全ノードが持つ子ノード
+        self._child_set = set()
+        # 木構造の対象だが未だ含まれていないノード
+        self._target_set = set()
+        # sortされた出力のcache 木が変更された時に破棄する
+        self._sorted_cache = {}
         self.add(root_code, child_path_list)
     
     def add(self, node_path, child_path_list):
@@ -37,27 +45,30 @@ class CodeTree:
         node_path       : ノードのpath
         childe_path_list: ノードの子のpath"""
         # 木に含まれるべき対称か判定
-        if len(self._node_data) != 0 and not node_path in self.target_list():
+        if len(self._node_data) != 0 and not node_path in self._target_set:
             message = '<{0}> is not tree\'s target'.format(
                                   path_to_string(node_path))
             raise ValueError(message)
-        code_list = self.code_list()
-        self._node_data.append(CodeTreeNood(
+        node = CodeTreeNood(
                     node_path,
                     tuple(child_path for child_path in child_path_list
-                          if (not child_path in code_list)
+                          if (not child_path in self._node_data)
+                             and (not child_path in self._child_set)
                              and (child_path != node_path)
-                             and (not child_path in self._exceptions))))
+                             and (not child_path in self._exception_set)))
+        self._node_data[node_path] = node
+        self._target_set.discard(node_path)
+        for child_path in node.child_path_list:
+            self._child_set.add(child_path)
+            if not child_path in self._node_data:
+                self._target_set.add(child_path)
+        self._sorted_cache.clear()
     
     def get(self, node_path):
         """指定したCodeTreeNodeを取得
         見つからなければNoneを返す
         node_path: CodeTreeNodeのnode_path"""
-        for node in self._node_data:
-            if node_path == node.node_path:
-                return node
-        else:
-            return None
+        return self._node_data.get(node_path)
     
     def remove(self, node_path):
         """指定したノードを取り除く
@@ -83,8 +94,7 @@ class CodeTree:
         if depth_sort:
             return tuple(node.node_path for _, node
                          in self.node_data_with_depth(depth_sort= True))
-        node_set = set(node.node_path for node in self._node_data)
-        return tuple(sorted(node_set, key= path_sort))
+        return sorted_cache(self, 'node', self._node_data.keys())
     
     def node_data_with_depth(self, depth_sort= False):
         """木に含まれる全ノード 深さ付き
@@ -95,31 +105,36 @@ class CodeTree:
     
     def child_list(self):
         """全ノードが持つ子ノード"""
-        code_set = set()
-        for node in self._node_data:
-            code_set.update(node.child_path_list)
-        return tuple(sorted(code_set, key= path_sort))
+        return sorted_cache(self, 'child', self._child_set)
     
     def code_list(self):
         """木に含まれる全ノードとその子ノードのリスト"""
-        code_set = set()
-        code_set.update(self.node_list())
-        code_set.update(self.child_list())
-        return tuple(sorted(code_set, key= path_sort))
+        return sorted_cache(self, 'code',
+                            self._child_set.union(self._node_data.keys()))
     
     def target_list(self):
         """木構造の対象だが未だ含まれていないノード"""
-        return tuple(sorted(
-                       set(self.child_list()).difference(self.node_list()),
-                       key= path_sort))
+        return sorted_cache(self, 'target', self._target_set)
     
     def is_closed(self):
         """木に含まれるべきコードが全て含まれているか判定"""
-        return len(self.target_list()) == 0
+        return len(self._target_set) == 0
+    
+    def removal(self, node_path):
+        """指定したノードを取り除いたと仮定した木を返す
+        木を複製せず、取り除かれる部分木のみを保持するviewとなる
+        指定したノードが存在しない時例外を発生させる"""
+        return CodeTreeRemoval(self, node_path)
     
     def copy(self):
-        """自身のcopy.deepcopyを返す"""
-        return copy.deepcopy(self)
+        """自身の複製を返す
+        ノードは不変であるため共有し、索引のみを複製する"""
+        tree = copy.copy(self)
+        tree._node_data    = self._node_data.copy()
+        tree._child_set    = self._child_set.copy()
+        tree._target_set   = self._target_set.copy()
+        tree._sorted_cache = self._sorted_cache.copy()
+        return tree
     
     def __str__(self):
         str_piece = []
@@ -136,14 +151,78 @@ class CodeTree:
                    ', '.join('{0}= {1}'.format(key, repr(getattr(self, key)))
                              for key in sorted(self.__dict__)))
 
+class CodeTreeRemoval:
+    """CodeTreeから指定したノードを取り除いた結果を表す読み取り専用のview
+    元のCodeTreeが変更された場合、結果は保証されない"""
+    def __init__(self, code_tree, node_path):
+        """コンストラクタ
+        code_tree: 元となるCodeTree
+        node_path: 取り除くノードのpath"""
+        node = code_tree.get(node_path)
+        if node is None:# 例外発生
+            message = '<{0}> is not found in node_data'.format(
+                                  path_to_string(node_path))
+            raise ValueError(message)
+        self._code_tree = code_tree
+        # 取り除かれるノード
+        self._removed_set = frozenset(
+                    removed.node_path
+                    for removed in subtree_node_list(code_tree, node))
+    
+    def get(self, node_path):
+        """指定したCodeTreeNodeを取得
+        見つからなければNoneを返す"""
+        if node_path in self._removed_set:
+            return None
+        return self._code_tree.get(node_path)
+    
+    def removed_list(self):
+        """取り除かれるノード"""
+        return tuple(sorted(self._removed_set, key= path_sort))
+    
+    def node_list(self):
+        """取り除いた後に木に含まれる全ノード"""
+        return tuple(node_path for node_path in self._code_tree.node_list()
+                     if not node_path in self._removed_set)
+
+def subtree_node_list(self, node):
+    """指定したノードとそのノードから派生した子ノードを列挙"""
+    node_list = []
+    stack = [node]
+    while len(stack) != 0:
+        subtree_node = stack.pop()
+        node_list.append(subtree_node)
+        for child_path in subtree_node.child_path_list:
+            child = self.get(child_path)
+            if child is None: continue
+            stack.append(child)
+    return node_list
+
+def sorted_cache(self, name, code_set):
+    """path_sortでsortしたtupleを返す
+    木が変更されるまでは同じ結果を再利用する
+    name    : cacheの名前
+    code_set: sortするpathの集合"""
+    if not name in self._sorted_cache:
+        self._sorted_cache[name] = tuple(sorted(code_set, key= path_sort))
+    return self._sorted_cache[name]
+
 def remove_node(self, node):
     """指定したノードを取り除く
     その際、そのノードから派生した子ノードも取り除く"""
-    for child_path in node.child_path_list:
-        child = self.get(child_path)
-        if child is None: continue
-        remove_node(self, child)
-    self._node_data.remove(node)
+    # 取り除くノードを列挙
+    removed_list = subtree_node_list(self, node)
+    # 取り除く
+    for removed in removed_list:
+        self._node_data.pop(removed.node_path, None)
+        for child_path in removed.child_path_list:
+            self._child_set.discard(child_path)
+            self._target_set.discard(child_path)
+    # 親ノードが残っているならば、再び木構造の対象となる
+    for removed in removed_list:
+        if removed.node_path in self._child_set:
+            self._target_set.add(removed.node_path)
+    self._sorted_cache.clear()
 
 def depth_mapping(self, depth_sort= False):
     """木に含まれる全ノード 深さ付き
@@ -152,21 +231,21 @@ def depth_mapping(self, depth_sort= False):
                       Dafault False"""
     if not isinstance(depth_sort, bool):
         raise ValueError
-    node_data = self._node_data.copy()
+    remaining_set = set(self._node_data.keys())
     data_list = []
-    # 再帰関数
-    def next(node_path, depth):
+    # rootを基点に行きがけ順に探索
+    #   再帰を用いないため、深いinclude関係でも再帰上限に達しない
+    stack = [(self._root_code, 0)]
+    while len(stack) != 0:
+        node_path, depth = stack.pop()
         node = self.get(node_path)
-        if node is None: return
+        if node is None: continue
         data_list.append((depth, node))
-        if node in node_data:
-            node_data.remove(node)
-        for child in node.child_path_list:
-            next(child, depth + 1)
-    # rootを基点に始動
-    next(self._root_code, 0)
+        remaining_set.discard(node_path)
+        stack.extend((child, depth + 1)
+                     for child in reversed(node.child_path_list))
     # 深さが与えられ無かったノードが存在するか判定
-    if len(node_data) != 0:
+    if len(remaining_set) != 0:
         message = 'nodes not all have a depth'
         raise ValueError(message)
     # 深さでソート
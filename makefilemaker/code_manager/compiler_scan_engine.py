@@ -0,0 +1,304 @@
+# -*- encoding: utf-8 -*-
+
+import os.path
+import re
+import shlex
+import pathlib
+import subprocess
+import concurrent.futures
+from .code_data import CodeDependence
+from .functions import check_dependence
+from .scan_engine import ScanEngine
+from .include_resolver import IncludeResolver
+from ..path_function import path_sort
+
+class CompilerScanEngine:
+    """コンパイラ(-MM -H)でソースコードの依存性を解析する
+    #if, マクロ, include pathを考慮した依存ファイルを得る
+    ソースコードが直接includeしているファイルを依存ファイルとし、
+    ヘッダファイルがincludeしているファイルは観測結果として別に返す
+    ヘッダファイル, ライブラリは正規表現による解析結果を返す
+    コンパイラにはコンパイル時と同じinclude設定を与える
+    with文で使用し、終了時にpoolを閉じる"""
+    
+    def __init__(self,
+                 build_command_maker,
+                 source_set,
+                 jobs= 1,
+                 include_resolver= None,
+                 scan_limit= None):
+        """コンストラクタ
+        build_command_maker: コンパイラ, include設定を持つBuildCommandMaker
+        source_set         : ソースコードのpathの集合
+        jobs               : 並列に実行するコンパイラの数
+        include_resolver   : 正規表現による解析で使用するIncludeResolver
+        scan_limit         : 正規表現による解析を打ち切る行数"""
+        self._build_command_maker = build_command_maker
+        self._source_set = source_set
+        self._jobs = max(1, jobs)
+        self._include_resolver = (include_resolver
+                                  if not include_resolver is None
+                                  else IncludeResolver())
+        self._scan_limit = scan_limit
+        # ライブラリの解析と、コンパイラが失敗した時の代替
+        self._regex_engine = ScanEngine(jobs,
+                                        self._include_resolver,
+                                        scan_limit)
+        self._executor = None
+        # ソースコード毎のヘッダファイルのinclude関係の観測結果
+        #   {source_path: {header: (include_file, ...), ...}, ...}
+        self._observation = {}
+        # ヘッダファイルの正規表現による解析結果
+        #   {header: CodeDependence, ...}
+        self._header_dependence = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+    
+    def fingerprint(self):
+        """解析設定を表す値"""
+        return {'scanner': 'compiler',
+                'compiler': repr((
+                        self._build_command_maker.compiler_setting
+                            .fingerprint(),
+                        tuple((target, path.as_posix()) for target, path
+                              in self._build_command_maker.include_setting)))}
+    
+    def input_files(self, dependence):
+        """解析結果が依存しているcode以外のファイル
+        これらが変更された場合は再度解析する必要がある"""
+        observation = self._observation.get(dependence.code_path)
+        if observation is None:
+            return tuple()
+        file_set = set(dependence.include_files)
+        file_set.update(observation.keys())
+        for include_files in observation.values():
+            file_set.update(include_files)
+        return tuple(sorted(file_set, key= path_sort))
+    
+    def observation(self, code_path):
+        """codeを解析した時に観測されたヘッダファイルのinclude関係
+        return {header: (include_file, ...), ...} 存在しなければNone"""
+        return self._observation.get(code_path)
+    
+    def scan(self, code_path_list):
+        """codeの依存性を解析
+        ソースコードのみコンパイラで解析し、
+        それ以外は正規表現による解析結果を返す
+        code_path_list: 対象とするcodeのpathのsequence
+        return (CodeDependence, ...) code_path_listと同じ順"""
+        regex_result = self._regex_engine.scan(code_path_list)
+        target_list = [dependence for dependence in regex_result
+                       if dependence.code_path in self._source_set]
+        # 1回のコンパイラの実行で1つのソースコードを解析し、
+        # 並列に実行する
+        if self._jobs == 1 or len(target_list) < 2:
+            compiler_result = map(self.scan_source, target_list)
+        else:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                            max_workers= self._jobs)
+            compiler_result = self._executor.map(self.scan_source,
+                                                 target_list)
+        include_files = {}
+        for dependence, result in zip(target_list, compiler_result):
+            if result is None:# 失敗した時は正規表現による解析結果
+                include_files[dependence.code_path] = dependence.include_files
+                continue
+            observation = dict(result)
+            include_files[dependence.code_path] = observation.pop(
+                        dependence.code_path)
+            self._observation[dependence.code_path] = observation
+        # 結果を結合
+        #   ソースコード以外は正規表現による解析結果のまま
+        return tuple(CodeDependence(dependence.code_path,
+                                    include_files.get(
+                                            dependence.code_path,
+                                            dependence.include_files),
+                                    dependence.include_libs)
+                     for dependence in regex_result)
+    
+    def scan_source(self, dependence):
+        """ソースコードをコンパイラで解析
+        dependence: 正規表現による解析結果
+        return {code_path: (include_file, ...), ...} 失敗した場合はNone"""
+        return run_compiler(self._build_command_maker,
+                            self._include_resolver,
+                            dependence,
+                            self.header_dependence)
+    
+    def header_dependence(self, header):
+        """ヘッダファイルの正規表現による解析結果
+        ソースコード毎の解析で共有する
+        return CodeDependence"""
+        dependence = self._header_dependence.get(header)
+        if dependence is None:
+            try:
+                dependence = check_dependence(
+                            header,
+                            self._include_resolver,
+                            self._scan_limit)
+            except OSError:
+                dependence = CodeDependence(header, tuple(), tuple())
+            self._header_dependence[header] = dependence
+        return dependence
+    
+    def shutdown(self):
+        """poolを閉じる"""
+        self._regex_engine.shutdown()
+        if not self._executor is None:
+            self._executor.shutdown()
+            self._executor = None
+
+def run_compiler(build_command_maker, include_resolver,
+                 dependence, header_dependence):
+    """コンパイラでソースコードのinclude関係を求める
+    コンパイラはソースコードのディレクトリで実行する
+    -MMで列挙されたヘッダファイルのみを対象とし、
+    それらの間のinclude関係は、正規表現による解析結果と
+    -Hで出力される階層(マクロによるincludeを含む)を合わせて得る
+    -Hはinclude guardで読み飛ばされたincludeを出力しないため、
+    それだけでは一部のinclude関係が欠ける
+    見つからないヘッダファイルは生成されるものとして扱い(-MG)、除く
+    include設定はコンパイル時と同じく、依存するlibraryのものだけを与える
+    依存するlibraryは検出したヘッダファイルのものを含むため、
+    それが増えなくなるまで繰り返す
+    build_command_maker: コンパイラ, include設定を持つBuildCommandMaker
+    include_resolver   : ファイルの存在判定に用いるIncludeResolver
+    dependence         : ソースコードの正規表現による解析結果
+    header_dependence  : ヘッダファイルを受け取り、
+                         その正規表現による解析結果を返す関数
+    return {code_path: (include_file, ...), ...} 失敗した場合はNone"""
+    source_path = dependence.code_path
+    code_dir = source_path.parent
+    include_libs = set(dependence.include_libs)
+    while True:
+        result = run_depend_command(build_command_maker,
+                                    include_resolver,
+                                    source_path,
+                                    tuple(sorted(include_libs)))
+        if result is None:
+            return None
+        header_set, hierarchy = result
+        # 検出したヘッダファイルが依存するlibrary
+        next_libs = include_libs.union(*(
+                    header_dependence(file_path).include_libs
+                    for file_path in header_set))
+        if next_libs == include_libs:
+            break
+        include_libs = next_libs
+    def to_path(file):
+        # 存在するファイルを絶対パス化
+        file_path = os.path.normpath(os.path.join(str(code_dir), file))
+        if include_resolver.exists(file_path):
+            return pathlib.Path(file_path).resolve()
+        return None
+    # -Hの階層を辿る
+    #   parent_list[depth]: 深さdepthまでで最も近いheader_setの要素
+    include_list = {source_path: set()}
+    parent_list = [source_path]
+    for line in hierarchy.splitlines():
+        match = hierarchy_regex.match(line)
+        if not match:
+            continue
+        depth = len(match.group('depth'))
+        if depth > len(parent_list):
+            continue
+        del parent_list[depth:]
+        parent = parent_list[depth - 1]
+        file_path = to_path(match.group('file'))
+        if file_path in header_set:
+            include_list[parent].add(file_path)
+            include_list.setdefault(file_path, set())
+            parent_list.append(file_path)
+        else:
+            parent_list.append(parent)
+    # -MMで列挙されたもの同士の正規表現によるinclude関係
+    include_list[source_path].update(
+                header_set.intersection(dependence.include_files))
+    for file_path in header_set:
+        include_list.setdefault(file_path, set()).update(
+                    header_set.intersection(
+                            header_dependence(file_path).include_files))
+    # どこからもincludeされていないものは
+    # ソースコードが直接includeしているとする
+    for file_path in header_set.difference(*include_list.values()):
+        if file_path != source_path:
+            include_list[source_path].add(file_path)
+    return dict((code_path, tuple(sorted(file_set, key= path_sort)))
+                for code_path, file_set in include_list.items())
+
+def run_depend_command(build_command_maker, include_resolver,
+                       source_path, include_libs):
+    """コンパイラ(-MM -MG -H)をソースコードのディレクトリで実行する
+    build_command_maker: コンパイラ, include設定を持つBuildCommandMaker
+    include_resolver   : ファイルの存在判定に用いるIncludeResolver
+    source_path        : ソースコードのpath
+    include_libs       : 依存しているlibrary
+    return (-MMで列挙された存在するヘッダファイルの集合, -Hの出力)
+           失敗した場合はNone"""
+    code_dir = source_path.parent
+    compiler_setting = build_command_maker.compiler_setting
+    command = shlex.split(compiler_setting.compiler)
+    command.extend(('-MM', '-MG', '-H'))
+    command.extend(compiler_setting.option_list)
+    for option in build_command_maker.include_option(include_libs):
+        command.extend(shlex.split(option))
+    command.append(source_path.name)
+    try:
+        process = subprocess.run(command,
+                                 cwd= str(code_dir),
+                                 stdout= subprocess.PIPE,
+                                 stderr= subprocess.PIPE)
+    except OSError:
+        return None
+    if process.returncode != 0:
+        return None
+    rule_list = parse_depend_rule(
+                process.stdout.decode('utf-8', 'surrogateescape'))
+    if len(rule_list) != 1:
+        return None
+    # 先頭はソースコード自身
+    header_set = set()
+    for file in rule_list[0][1][1:]:
+        # 存在するファイルを絶対パス化
+        file_path = os.path.normpath(os.path.join(str(code_dir), file))
+        if include_resolver.exists(file_path):
+            header_set.add(pathlib.Path(file_path).resolve())
+    return (header_set,
+            process.stderr.decode('utf-8', 'surrogateescape'))
+
+def parse_depend_rule(text):
+    """Makefile形式の依存関係を解析
+    text: コンパイラの-MMの出力
+    return [(target, (prerequisite, ...)), ...]"""
+    result = []
+    for line in text.replace('\\\n', ' ').splitlines():
+        word_list = [unescape_word(match.group())
+                     for match in word_regex.finditer(line)]
+        if len(word_list) == 0:
+            continue
+        # 最初の':'までがtarget
+        for i, word in enumerate(word_list):
+            if word.endswith(':'):
+                target = ' '.join(word_list[:i] + [word[:-1]])
+                result.append((target, tuple(word_list[i + 1:])))
+                break
+    return result
+
+def unescape_word(word):
+    """Makefile形式でescapeされたファイル名を戻す"""
+    return unescape_regex.sub(
+                lambda match: '$' if match.group() == '$$' else match.group(1),
+                word)
+
+# 空白で区切られた語 ('\ 'は区切りとしない)
+word_regex = re.compile(r'(?:\\.|[^\s\\]|\\$)+')
+# escapeされた文字
+unescape_regex = re.compile(r'\\([ #\\])|\$\$')
+# -Hの出力 '<depth個の.> <file>'
+hierarchy_regex = re.compile(r'^(?P<depth>\.+) (?P<file>.+)$')
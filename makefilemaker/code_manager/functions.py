@@ -1,107 +1,173 @@
 # -*- encoding: utf-8 -*-
 
+import os
 import re
+import pathlib
+import mmap
 from ..path_function  import path_to_string, path_sort
 from .code_data import CodeDependence
 from .code_tree import CodeTree
 
-def check_dependence(code_path):
+def check_dependence(code_path, include_resolver= None, scan_limit= None):
     """codeが依存しているファイル, ライブラリを検出
-    code_path: 対象とするcodeのpath"""
+    ファイルはbytesとして読み込み、1つの正規表現で全体を検索する
+    code_path       : 対象とするcodeのpath
+    include_resolver: headerを探索するIncludeResolver
+                        Noneならばcodeのディレクトリからの相対パスとする
+    scan_limit      : プリプロセッサ指令以外の行がこの数に達したら、
+                      それ以降は検索しない
+                        Noneならばファイル全体を検索する"""
     # 検出したヘッダファイル, ライブラリ
     include_files = []
     include_libs  = []
-    # 正規表現
-    include_file_regex = re.compile('#include( +|)"(?P<header>.+)"')
-    include_lib_regex  = re.compile('#include( +|)<(?P<header>.+)>')
-    with code_path.open(encoding= 'utf-8', newline= '') as code_file:
-        for line in code_file:
-            # match
-            include_file_match = include_file_regex.match(line)
-            include_lib_match  = include_lib_regex.match(line)
-            # include_file判定
-            if include_file_match:
-                # 絶対パス化
-                header_path = code_path.parent.joinpath(
-                    include_file_match.group('header')).resolve()
-                include_files.append(header_path)
-            # include_lib判定
-            elif include_lib_match:
-                include_libs.append(include_lib_match.group('header'))
+    with code_path.open(mode= 'rb') as code_file:
+        code = read_code(code_file)
+        try:
+            end = scan_end(code, scan_limit)
+            for match in include_regex.finditer(code, 0, end):
+                header, library = match.group('header', 'library')
+                # include_file判定
+                if not header is None:
+                    header = header.decode('utf-8', 'surrogateescape')
+                    # 絶対パス化
+                    if include_resolver is None:
+                        header_path = code_path.parent.joinpath(
+                                    header).resolve()
+                    else:
+                        header_path = include_resolver.resolve(
+                                    code_path.parent, header)
+                    include_files.append(header_path)
+                # include_lib判定
+                else:
+                    include_libs.append(
+                                library.decode('utf-8', 'surrogateescape'))
+        finally:
+            if isinstance(code, mmap.mmap):
+                code.close()
     #出力
     return CodeDependence(code_path,
                           tuple(sorted(include_files, key= path_sort)),
                           tuple(sorted(include_libs)))
 
-def full_dependence(source_path, dependence_list):
-    """sourceが依存しているファイルを全て纏める
-    source_path    : 対象とするsourceのpath
-    dependence_list: 依存性解析結果集"""
-    # 初期設定
-    include_files = set(dependence_list[source_path].include_files)
-    include_libs  = set(dependence_list[source_path].include_libs)
-    # 探索済みリスト
-    checked_files = {source_path}
-    target_files  = check_target(checked_files, dependence_list)
-    while len(target_files) != 0:
-        for target in target_files:
-            include_files.update(dependence_list[target].include_files)
-            include_libs .update(dependence_list[target].include_libs)
-        checked_files.update(target_files)
-        target_files  = check_target(checked_files, dependence_list)
-    
-    return CodeDependence(source_path,
-                          tuple(sorted(include_files, key= path_sort)),
-                          tuple(sorted(include_libs)))
+def read_code(code_file):
+    """codeをbytesとして読み込む
+    mmap_threshold以上の大きさのファイルはmemory-mapする"""
+    size = os.fstat(code_file.fileno()).st_size
+    if size >= mmap_threshold:
+        try:
+            return mmap.mmap(code_file.fileno(), 0, access= mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            pass
+    return code_file.read()
 
-def check_target(checked_list, dependence_list):
-    """解析されたファイルに関連するファイルで, 未だ調査されていないものを選出
-    checked_list   : 依存性解析されたファイルのリスト
-    dependence_list: 依存性解析結果集"""
-    # 検出されたファイル
-    detected_list = set(file
-        for checked_file in checked_list
-        for file         in dependence_list[checked_file].include_files)
-    # 差を出力
-    return sorted(detected_list.difference(checked_list), key= path_sort)
+def scan_end(code, scan_limit):
+    """検索を打ち切る位置
+    プリプロセッサ指令, 空行, コメント以外の行をscan_limit行検出した位置
+    /* */ の中の行は数えない"""
+    if scan_limit is None:
+        return len(code)
+    count = 0
+    for match in code_line_regex.finditer(code):
+        if match.group('code') is None:# コメント, 文字列
+            continue
+        count += 1
+        if count >= scan_limit:
+            return match.start()
+    return len(code)
 
-def reverse_dependence(dependence_list, verbose= False):
-    """依存性解析結果を反転させる
-    ファイルとそのファイルに依存しているファイルリストの組を出力
-    dependence_list: 依存性解析結果集
-    出力
-    {code_path: (file that are dependent on code, ...), ...}"""
-    reversed_list = {}
-    # 被依存ファイルリストを取得
-    included_list = sorted(set(
-                file for dependence_data in dependence_list.values()
-                     for file            in dependence_data.include_files),
-                key= path_sort)
-    if verbose:# 表示
-        print('ReverseDependence')
-        print('included list')
-        for path in included_list:
-            print('  {0}'.format(path_to_string(path)))
-        print()
-    # 初期化
-    for file in included_list:
-        reversed_list[file] = []
-    # 各々を解析
-    for code_path, dependence_data in dependence_list.items():
-        for include_file in dependence_data.include_files:
-            reversed_list[include_file].append(code_path)
-    # ソート
-    for code_list in reversed_list.values():
-        code_list.sort(key= path_sort)
-    if verbose:# 反転結果を表示
-        print('ReverseDependence Result')
-        for included_file in sorted(reversed_list.keys(), key= path_sort):
-            print('included file: {0}'.format(
-                        path_to_string(included_file)))
-            for code_path in reversed_list[included_file]:
-                print('  {0}'.format(path_to_string(code_path)))
-            print()
-    return reversed_list
+# #include "header", #include <library>
+#   #とincludeの間の空白も許容する
+include_regex = re.compile(
+            rb'^[ \t]*#[ \t]*include[ \t]*'
+            rb'(?:"(?P<header>[^"\r\n]+)"|<(?P<library>[^>\r\n]+)>)',
+            re.MULTILINE)
+# プリプロセッサ指令, 空行, コメント以外の行
+#   /* */, // と文字列は読み飛ばし、その中の行は数えない
+code_line_regex = re.compile(
+            rb'/\*.*?(?:\*/|\Z)'
+            rb'|//[^\r\n]*'
+            rb'|"(?:\\.|[^"\\\r\n])*"'
+            rb"|'(?:\\.|[^'\\\r\n])*'"
+            rb'|^[ \t]*(?P<code>[^#/*\s"\'])',
+            re.MULTILINE | re.DOTALL)
+# memory-mapして読み込むファイルの大きさ
+mmap_threshold = 1 << 20
+
+def scan_code_list(self, engine, code_path_list):
+    """ScanCacheを参照しつつ複数のcodeの依存性を解析
+    self          : CodeManager
+    engine        : ScanEngine or CompilerScanEngine
+    code_path_list: 対象とするcodeのpathのsequence
+    return ((CodeDependence, observation), ...) code_path_listと同じ順
+             observationは観測されたヘッダファイルのinclude関係 or None"""
+    if self._scan_cache is None:
+        return tuple((dependence, engine.observation(dependence.code_path))
+                     for dependence in engine.scan(code_path_list))
+    # 解析設定が異なる結果は使用しない
+    setting = engine.fingerprint()
+    setting.update({
+                'include_path': list(self._include_resolver.fingerprint()),
+                'scan_limit': self._option.scan_limit})
+    self._scan_cache.set_setting(setting)
+    # cacheに無いものだけを解析
+    result = [self._scan_cache.lookup(code_path)
+              for code_path in code_path_list]
+    missed_list = [code_path for code_path, dependence
+                   in zip(code_path_list, result) if dependence is None]
+    missed_result = iter(engine.scan(missed_list))
+    for i, dependence in enumerate(result):
+        if dependence is None:
+            result[i] = next(missed_result)
+            observation = engine.observation(result[i].code_path)
+            self._scan_cache.store(
+                        result[i],
+                        engine.input_files(result[i])
+                            + search_directories(self, result[i], observation),
+                        observation)
+    return tuple((dependence,
+                  self._scan_cache.observation(dependence.code_path))
+                 for dependence in result)
+
+def search_directories(self, dependence, observation= None):
+    """依存性解析結果のheaderの探索が依存するディレクトリ
+    ディレクトリにファイルが追加, 削除された場合は探索結果が変わりうる
+    self       : CodeManager
+    dependence : CodeDependence
+    observation: 観測されたヘッダファイルのinclude関係 or None
+    return (pathlib.Path, ...)"""
+    include_list = [(dependence.code_path, dependence.include_files)]
+    if not observation is None:
+        include_list.extend(observation.items())
+    dir_set = set()
+    for code_path, include_files in include_list:
+        for include_file in include_files:
+            dir_set.update(self._include_resolver.search_directories(
+                        code_path.parent, include_file))
+    return tuple(pathlib.Path(dir_path) for dir_path in sorted(dir_set))
+
+def merge_observation(self, observation):
+    """観測されたヘッダファイルのinclude関係を統合
+    self       : CodeManager
+    observation: {header: (include_file, ...), ...}
+    return include関係が追加されたヘッダファイルのset"""
+    updated_set = set()
+    for header, include_files in observation.items():
+        include_set = self._observed_include.setdefault(header, set())
+        if not include_set.issuperset(include_files):
+            include_set.update(include_files)
+            updated_set.add(header)
+    return updated_set
+
+def observed_dependence(self, dependence):
+    """ヘッダファイルの依存ファイルを観測されたinclude関係に置き換える
+    self      : CodeManager
+    dependence: CodeDependence"""
+    return CodeDependence(
+                dependence.code_path,
+                tuple(sorted(self._observed_include.get(
+                                    dependence.code_path, tuple()),
+                             key= path_sort)),
+                dependence.include_libs)
 
 def make_code_tree(self, root_code_path, exceptions= []):
     """一つのコードを根としてコードの依存関係の木構造をつくる
@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+
+import os
+import os.path
+import pathlib
+
+class IncludeResolver:
+    """#include "header" のheaderを探索する
+    includeしているファイルのディレクトリ, include pathの順に探索する
+    ディレクトリの内容はos.scandirで一度だけ読み込み、索引として保持する
+    見つからなかった結果も保持する"""
+    
+    def __init__(self, include_path_list= tuple()):
+        """コンストラクタ
+        include_path_list: 探索するinclude pathのiterable (絶対パス)"""
+        self._include_path_list = tuple(
+                    os.path.normpath(str(include_path))
+                    for include_path in include_path_list)
+        # ディレクトリの索引
+        #   {dir_path: frozenset(file_name, ...), ...}
+        self._directory_index = {}
+        # 探索結果
+        #   {(code_dir, header): pathlib.Path, ...}
+        self._result_cache = {}
+    
+    def __getstate__(self):
+        """process間で受け渡す時は索引を含めない"""
+        return {'_include_path_list': self._include_path_list}
+    
+    def __setstate__(self, state):
+        self.__init__(state['_include_path_list'])
+    
+    @property
+    def include_path_list(self):
+        """探索するinclude path"""
+        return self._include_path_list
+    
+    def fingerprint(self):
+        """探索設定を表す値"""
+        return tuple(pathlib.Path(include_path).as_posix()
+                     for include_path in self._include_path_list)
+    
+    def resolve(self, code_dir, header):
+        """headerのpathを返す
+        見つからなければincludeしているファイルのディレクトリからの
+        相対パスとして扱う
+        code_dir: includeしているファイルのディレクトリ
+        header  : #include "header" のheader"""
+        key = (code_dir, header)
+        result = self._result_cache.get(key)
+        if result is None:
+            result = self.search(code_dir, header)
+            self._result_cache[key] = result
+        return result
+    
+    def search(self, code_dir, header):
+        """headerを探索"""
+        for search_dir in (str(code_dir),) + self._include_path_list:
+            candidate = os.path.normpath(os.path.join(search_dir, header))
+            if self.exists(candidate):
+                return pathlib.Path(candidate).resolve()
+        # 見つからない
+        return pathlib.Path(code_dir).joinpath(header).resolve()
+    
+    def search_directories(self, code_dir, include_file):
+        """include_fileを探索した結果が依存するディレクトリ
+        include_fileとなりうる各headerについて、
+        探索で内容を参照する全てのディレクトリを返す
+        code_dir    : includeしているファイルのディレクトリ
+        include_file: resolveの結果
+        return (dir_path, ...)"""
+        search_dir_list = (os.path.normpath(str(code_dir)),) \
+                          + self._include_path_list
+        file_path = os.path.normpath(str(include_file))
+        # include_fileとなりうるheader
+        header_set = set()
+        for search_dir in search_dir_list:
+            header = os.path.relpath(file_path, search_dir)
+            if (search_dir == search_dir_list[0]
+                or not header.split(os.sep)[0] == os.pardir):
+                header_set.add(header)
+        result = set()
+        for header in header_set:
+            for search_dir in search_dir_list:
+                result.add(os.path.dirname(
+                            os.path.normpath(os.path.join(search_dir, header))))
+        return tuple(sorted(result))
+    
+    def exists(self, file_path):
+        """索引を用いてファイルの存在を判定
+        file_path: 正規化された絶対パス"""
+        dir_path, file_name = os.path.split(file_path)
+        return file_name in self.directory_entry(dir_path)
+    
+    def directory_entry(self, dir_path):
+        """ディレクトリに含まれるファイル名の集合
+        存在しないディレクトリは空集合とする"""
+        entry = self._directory_index.get(dir_path)
+        if entry is None:
+            try:
+                with os.scandir(dir_path) as entry_iter:
+                    entry = frozenset(
+                                dir_entry.name for dir_entry in entry_iter
+                                if not dir_entry.is_dir())
+            except OSError:
+                entry = frozenset()
+            self._directory_index[dir_path] = entry
+        return entry
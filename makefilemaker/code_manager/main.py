@@ -5,7 +5,14 @@ import pathlib
 from   collections import namedtuple
 
 from .code_data import CodeDependence
-from .functions import check_dependence, full_dependence, check_target, reverse_dependence, save_dependent_graph, make_code_tree
+from .functions import save_dependent_graph, make_code_tree, scan_code_list, merge_observation, observed_dependence
+from .scan_engine import ScanEngine
+from .compiler_scan_engine import CompilerScanEngine
+from .scanner import Scanner
+from .closure_engine import ClosureEngine
+from .reverse_index import ReverseDependenceIndex
+from .scan_cache import ScanCache
+from .include_resolver import IncludeResolver
 from ..path_function  import path_to_string, path_sort
 from ..print_function import print_indented
 
@@ -14,6 +21,7 @@ class CodeManager:
         self._option = option
         # source_codeのリスト
         self._source_code = []
+        self._source_code_set = set()
         # main_codeのリスト
         self._main_code   = []
         # main_codeとprogram_nameとの関連
@@ -22,6 +30,23 @@ class CodeManager:
         # 各codeの依存性解析結果
         #   {code_path: CodeDependence, ...}
         self._dependent_data_list = {}
+        # 被依存関係
+        #   依存性解析結果の追加, 更新に合わせて更新する
+        self._reverse_index = ReverseDependenceIndex()
+        # 依存性解析結果のcache
+        self._scan_cache = None
+        # #include "header" の探索
+        self._include_resolver = IncludeResolver()
+        # 依存性解析の方法
+        self._scanner = Scanner.Regex
+        #   Scanner.Compilerで使用するBuildCommandMaker
+        self._build_command_maker = None
+        #   観測されたヘッダファイルのinclude関係
+        #   {header: {include_file, ...}, ...}
+        self._observed_include = {}
+        # 推移的な依存の計算結果
+        #   依存性解析結果が更新された時に破棄する
+        self._closure_engine   = None
     
     @property
     def source_code(self):
@@ -40,51 +65,164 @@ class CodeManager:
         return self._dependent_data_list
     
     def depended_data_list(self):
-        """コードの被依存解析結果を返す
-        ((code, (depended_code, ...)), ...)"""
-        data_list = reverse_dependence(self._dependent_data_list,
-                                       self._option.verbose >= 3)
+        """コードの被依存解析結果を読み取り専用で返す
+        {code: (depended_code, ...), ...}"""
+        data_list = self._reverse_index.view()
+        if self._option.verbose >= 3:# 被依存解析結果を表示
+            print('ReverseDependence Result')
+            for included_file in sorted(data_list.keys(), key= path_sort):
+                print('included file: {0}'.format(
+                            path_to_string(included_file)))
+                for code_path in data_list[included_file]:
+                    print('  {0}'.format(path_to_string(code_path)))
+                print()
         return data_list
     
     def add_source(self, source_path):
         """ソースコードを追加"""
-        # 絶対パス化
-        source_path = pathlib.Path(source_path).resolve()
-        if source_path in self._source_code:
-            if self._option.verbose >= 1:# 表示
-                print('source<0> is rlready appended'
-                            .format(path_to_string(source_path)))
-            return
-        if self._option.verbose >= 1:# ソースコード表示
-            print('add source<{0}>'.format(path_to_string(source_path)))
-        self._source_code.append(source_path)
+        self.add_sources((source_path,))
+    
+    def add_sources(self, source_path_list):
+        """ソースコードをまとめて追加
+        新たに検出したファイルは一度だけ依存性解析される
+        source_path_list: ソースコードのpathのiterable"""
+        # 新たに追加するソースコード
+        target_list = []
+        for source_path in source_path_list:
+            # 絶対パス化
+            source_path = pathlib.Path(source_path).resolve()
+            if source_path in self._source_code_set:
+                if self._option.verbose >= 1:# 表示
+                    print('source<{0}> is already appended'
+                                .format(path_to_string(source_path)))
+                continue
+            if self._option.verbose >= 1:# ソースコード表示
+                print('add source<{0}>'.format(path_to_string(source_path)))
+            self._source_code.append(source_path)
+            self._source_code_set.add(source_path)
+            target_list.append(source_path)
         # 依存性解析
-        self._dependent_data_list[source_path] = check_dependence(source_path)
-        if self._option.verbose >= 2:# 依存性解析結果を表示
-            print_indented(self._dependent_data_list[source_path], 4)
-            print()
-        # 新たに検出したファイルの依存性解析
-        #   初期の捜査対象
-        target_list = check_target(self._dependent_data_list.keys(),
-                                   self._dependent_data_list)
-        while len(target_list) != 0:
-            if self._option.verbose >= 3:# 対象ファイルを列挙
-                print('target list:')
-                for target in target_list:
-                    print('  {0}'.format(path_to_string(target)))
-                print()
-            # 各対象を依存性関係結果に追加
-            for target in target_list:
-                self._dependent_data_list[target] = check_dependence(target)
-                if self._option.verbose >= 1:# 検出したファイルを表示
-                    print('  add file<{0}>'.format(path_to_string(target)))
-                if self._option.verbose >= 2:# 依存性関係結果を表示
-                    print_indented(self._dependent_data_list[target], 6)
+        self.scan_dependence(target_list)
+    
+    def scan_dependence(self, target_list):
+        """依存性解析
+        解析対象が無くなるまで新たに検出したファイルを解析
+        各段階の解析対象はまとめて並列に解析される
+        target_list: 解析対象とするソースコードのpathのlist"""
+        with self.scan_engine() as engine:
+            source_round = True
+            while len(target_list) != 0:
+                if self._option.verbose >= 3 and not source_round:
+                    # 対象ファイルを列挙
+                    print('target list:')
+                    for target in target_list:
+                        print('  {0}'.format(path_to_string(target)))
                     print()
-            # 新たに検出した対象ファイル
-            target_list = check_target(
-                    self._dependent_data_list.keys(),
-                    self._dependent_data_list)
+                target_set = set(target_list)
+                detected_set = set()
+                updated_set  = set()
+                result_list = scan_code_list(self, engine, target_list)
+                for target, (dependence, observation) in zip(target_list,
+                                                             result_list):
+                    if (not target in self._source_code_set
+                        and target in self._observed_include):
+                        # ヘッダファイルは観測されたinclude関係を用いる
+                        #   観測されていなければ正規表現による解析結果
+                        dependence = observed_dependence(self, dependence)
+                    self.update_dependence(dependence)
+                    if self._option.verbose >= 1 and not source_round:
+                        # 検出したファイルを表示
+                        print('  add file<{0}>'.format(
+                                    path_to_string(target)))
+                    if self._option.verbose >= 2:# 依存性解析結果を表示
+                        print_indented(dependence, 4 if source_round else 6)
+                        print()
+                    if not observation is None:
+                        updated_set.update(
+                                    merge_observation(self, observation))
+                    # 未解析のファイルを次の解析対象とする
+                    detected_set.update(dependence.include_files)
+                # 解析済みのヘッダファイルのinclude関係が追加された
+                for header in sorted(updated_set, key= path_sort):
+                    if header in self._dependent_data_list:
+                        dependence = observed_dependence(
+                                    self, self._dependent_data_list[header])
+                        self.update_dependence(dependence)
+                        detected_set.update(dependence.include_files)
+                target_list = sorted(
+                            (file for file in detected_set
+                             if not (file in self._dependent_data_list
+                                     or file in target_set)),
+                            key= path_sort)
+                source_round = False
+    
+    def update_dependence(self, dependence):
+        """依存性解析結果を登録
+        dependence: CodeDependence"""
+        code_path = dependence.code_path
+        self._reverse_index.update(code_path,
+                                   self._dependent_data_list.get(code_path),
+                                   dependence)
+        self._dependent_data_list[code_path] = dependence
+        self._closure_engine   = None
+    
+    def set_include_path(self, include_path_list):
+        """#include "header" を探索するinclude pathを設定
+        既に解析したものがあれば、全てのソースコードを再度解析する
+        include_path_list: include pathのiterable"""
+        include_resolver = IncludeResolver(
+                    pathlib.Path(include_path).resolve()
+                    for include_path in include_path_list)
+        if (include_resolver.include_path_list
+            == self._include_resolver.include_path_list):
+            return
+        self._include_resolver = include_resolver
+        self.rescan()
+    
+    def set_scanner(self, scanner, build_command_maker= None):
+        """依存性解析の方法を設定
+        既に解析したものがあれば、全てのソースコードを再度解析する
+        scanner            : Scanner
+        build_command_maker: Scanner.Compilerで使用するBuildCommandMaker"""
+        if scanner is Scanner.Compiler and build_command_maker is None:
+            message = 'Scanner.Compiler requires BuildCommandMaker'
+            raise ValueError(message)
+        if (scanner is self._scanner
+            and build_command_maker is self._build_command_maker):
+            return
+        self._scanner = scanner
+        self._build_command_maker = build_command_maker
+        self.rescan()
+    
+    def update_compiler(self):
+        """コンパイラ設定の変更を反映
+        コンパイラで解析している場合は全てのソースコードを再度解析する"""
+        if self._scanner is Scanner.Compiler:
+            self.rescan()
+    
+    def scan_engine(self):
+        """依存性解析を行うengineを生成"""
+        if self._scanner is Scanner.Compiler:
+            return CompilerScanEngine(self._build_command_maker,
+                                      self._source_code_set,
+                                      self._option.jobs,
+                                      self._include_resolver,
+                                      self._option.scan_limit)
+        return ScanEngine(self._option.jobs,
+                          self._include_resolver,
+                          self._option.scan_limit)
+    
+    def rescan(self):
+        """既に解析したものを破棄し、全てのソースコードを再度解析する"""
+        if len(self._dependent_data_list) == 0:
+            return
+        if self._option.verbose >= 1:# 表示
+            print('rescan dependence')
+        self._dependent_data_list = {}
+        self._observed_include = {}
+        self._reverse_index.clear()
+        self._closure_engine   = None
+        self.scan_dependence(list(self._source_code))
     
     def add_main_code(self, main_code_path, program_path):
         """mainコードを追加"""
@@ -102,10 +240,13 @@ class CodeManager:
         """各ソースコードの全依存関係を解析し出力"""
         if self._option.verbose >= 2:# 依存性集計結果を表示
             print('Check FullDependence')
+        if self._closure_engine is None:
+            self._closure_engine = ClosureEngine(
+                        self._dependent_data_list)
         result = {}
         for source_code in self.source_code:
-            result[source_code] = full_dependence(
-                        source_code, self._dependent_data_list)
+            result[source_code] = self._closure_engine.full_dependence(
+                        source_code)
             if self._option.verbose >= 2:# 依存性集計結果を表示
                 print('full dependence<{0}>'
                             .format(path_to_string(source_code)))
@@ -113,6 +254,21 @@ class CodeManager:
                 print()
         return result
     
+    def resolve_include(self, code_path, header):
+        """codeの #include "header" が指すファイルのpath
+        code_path: includeしているcodeのpath
+        header   : #include "header" のheader"""
+        return self._include_resolver.resolve(code_path.parent, header)
+    
+    def full_dependence(self, code_path):
+        """codeが推移的に依存しているファイル, ライブラリ
+        code_path: 依存性解析されたcodeのpath
+        return CodeDependence"""
+        if self._closure_engine is None:
+            self._closure_engine = ClosureEngine(
+                        self._dependent_data_list)
+        return self._closure_engine.full_dependence(code_path)
+    
     def structure(self):
         """ディレクトリ構成を出力
         {dirpath: (source_path, ...), ...}"""
@@ -130,6 +286,20 @@ class CodeManager:
         exceptions    : 木構造に含まれる対象外となるcode"""
         return make_code_tree(self, root_code_path, exceptions)
     
+    def set_scan_cache(self, file_path, hash_mode= False):
+        """依存性解析結果のcacheを設定
+        file_path: cacheを保存するファイルのpath
+        hash_mode: 内容のhash値でファイルの変更を判定するか"""
+        self._scan_cache = ScanCache(file_path, hash_mode)
+    
+    def save_scan_cache(self):
+        """依存性解析結果のcacheを保存"""
+        if self._scan_cache is None:
+            return
+        self._scan_cache.save()
+        if self._option.verbose >= 1:# cacheの統計を表示
+            print(self._scan_cache)
+    
     def save_dependent_graph(self, file_path):
         save_dependent_graph(self, file_path)
     
@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+
+from collections.abc import Mapping
+from ..path_function import path_sort
+
+class ReverseDependenceIndex:
+    """被依存関係 {code_path: (file that are dependent on code, ...), ...}
+    依存性解析結果の追加, 更新に合わせて差分のみを更新する"""
+    
+    def __init__(self):
+        # {code_path: {depending_code, ...}, ...}
+        self._depended_set = {}
+        # 公開用の整列済みデータ {code_path: (depending_code, ...), ...}
+        self._depended_data = {}
+        self._view = ReverseDependenceView(self)
+        # 整列済みデータの更新が必要なcode
+        self._dirty_set = set()
+    
+    def update(self, code_path, old_dependence, new_dependence):
+        """codeの依存性解析結果の変更を反映
+        code_path     : 対象とするcodeのpath
+        old_dependence: 以前のCodeDependence 初回はNone
+        new_dependence: 新しいCodeDependence"""
+        old_files = (set() if old_dependence is None
+                     else set(old_dependence.include_files))
+        new_files = set(new_dependence.include_files)
+        for file in old_files.difference(new_files):
+            self._depended_set[file].discard(code_path)
+            self._dirty_set.add(file)
+        for file in new_files.difference(old_files):
+            self._depended_set.setdefault(file, set()).add(code_path)
+            self._dirty_set.add(file)
+    
+    def clear(self):
+        """全ての被依存関係を破棄
+        取得済みのviewはそのまま使用できる"""
+        self._depended_set.clear()
+        self._depended_data.clear()
+        self._dirty_set.clear()
+    
+    def refresh(self):
+        """更新が必要なcodeの整列済みデータを作り直す"""
+        for file in self._dirty_set:
+            code_set = self._depended_set.get(file)
+            if code_set:
+                self._depended_data[file] = tuple(
+                            sorted(code_set, key= path_sort))
+            else:
+                self._depended_set.pop(file, None)
+                self._depended_data.pop(file, None)
+        self._dirty_set.clear()
+        return self._depended_data
+    
+    def view(self):
+        """読み取り専用の被依存関係を返す
+        以降のupdateも参照時に反映される"""
+        return self._view
+
+class ReverseDependenceView(Mapping):
+    """ReverseDependenceIndexの読み取り専用の参照
+    参照する度に未反映の更新を反映する"""
+    
+    def __init__(self, index):
+        self._index = index
+    
+    def __getitem__(self, code_path):
+        return self._index.refresh()[code_path]
+    
+    def __iter__(self):
+        return iter(self._index.refresh())
+    
+    def __len__(self):
+        return len(self._index.refresh())
+    
+    def __contains__(self, code_path):
+        return code_path in self._index.refresh()
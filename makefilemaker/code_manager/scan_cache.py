@@ -0,0 +1,180 @@
+# -*- encoding: utf-8 -*-
+
+import json
+import pathlib
+from .code_data import CodeDependence
+from ..file_hash import file_hash, file_stamp
+from ..path_function import path_sort
+
+class ScanCache:
+    """依存性解析結果(CodeDependence)の永続cache
+    path, 更新時刻, サイズ(hash_modeならば内容のhash値)をkeyとする
+    解析設定(include path, 検索の打ち切り)が変わった場合は全て破棄する
+    headerの探索結果はディレクトリの内容に依存するため、
+    探索したディレクトリの更新時刻もentry毎に比較する"""
+    version = 8
+    
+    def __init__(self, file_path, hash_mode= False):
+        """コンストラクタ
+        file_path: cacheを保存するファイルのpath
+        hash_mode: 更新時刻, サイズが異なる時に内容のhash値で比較するか"""
+        self._file_path = pathlib.Path(file_path)
+        self._hash_mode = hash_mode
+        # 解析設定
+        #   {'include_path': [str, ...], 'scan_limit': int or None}
+        self._setting = {}
+        # cacheの内容
+        #   {code_path: {'stamp': (mtime_ns, size), 'hash': str or None,
+        #                'input_stamp': ((path, (mtime_ns, size)), ...),
+        #                'observation': {header: (include_file, ...), ...}
+        #                               or None,
+        #                'dependence': CodeDependence}, ...}
+        self._entry_list = {}
+        # 統計
+        self.hit     = 0
+        self.miss    = 0
+        self.evicted = 0
+        self.load()
+    
+    def set_setting(self, setting):
+        """解析設定を設定
+        cacheされたものと異なる場合は全てのentryを破棄する
+        setting: JSONに変換可能なdict"""
+        if setting != self._setting:
+            self.evicted += len(self._entry_list)
+            self._entry_list = {}
+            self._setting = setting
+    
+    def lookup(self, code_path):
+        """cacheされた依存性解析結果を返す
+        見つからない, もしくは古い場合はNoneを返す
+        code_path: 対象とするcodeのpath"""
+        entry = self._entry_list.get(code_path)
+        stamp = file_stamp(code_path)
+        if entry is None or stamp is None:
+            self.miss += 1
+            return None
+        if entry['stamp'] != stamp:
+            # 更新時刻, サイズが異なる
+            if (not self._hash_mode or entry['hash'] is None
+                or entry['hash'] != file_hash(code_path)):
+                self.miss += 1
+                return None
+            entry['stamp'] = stamp
+        # 解析結果が依存しているファイルの更新時刻, サイズ
+        if any(file_stamp(input_path) != input_stamp
+               for input_path, input_stamp in entry['input_stamp']):
+            self.miss += 1
+            return None
+        self.hit += 1
+        return entry['dependence']
+    
+    def observation(self, code_path):
+        """cacheされたヘッダファイルのinclude関係の観測結果を返す"""
+        entry = self._entry_list.get(code_path)
+        return None if entry is None else entry['observation']
+    
+    def store(self, dependence, input_files= tuple(), observation= None):
+        """依存性解析結果をcacheに登録
+        dependence : CodeDependence
+        input_files: code以外に解析結果が依存しているファイル, ディレクトリ
+                       これらが変更された場合もcacheを使用しない
+        observation: 解析時に観測されたヘッダファイルのinclude関係"""
+        code_path = dependence.code_path
+        self._entry_list[code_path] = {
+                    'stamp': file_stamp(code_path),
+                    'hash': file_hash(code_path) if self._hash_mode else None,
+                    'input_stamp': tuple((input_path, file_stamp(input_path))
+                                         for input_path in input_files),
+                    'observation': observation,
+                    'dependence': dependence}
+    
+    def evict(self):
+        """削除されたファイルのentryを取り除く"""
+        removed_list = [code_path for code_path in self._entry_list.keys()
+                        if file_stamp(code_path) is None]
+        for code_path in removed_list:
+            del self._entry_list[code_path]
+        self.evicted += len(removed_list)
+        return len(removed_list)
+    
+    def load(self):
+        """cacheファイルを読み込む
+        存在しない, もしくはversionが異なる場合は空のcacheとする"""
+        self._entry_list = {}
+        self._setting = {}
+        try:
+            with self._file_path.open(encoding= 'utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (data.get('version') != self.version
+            or data.get('hash_mode') != self._hash_mode):
+            return
+        self._setting = data.get('setting', {})
+        for code, entry in data.get('entry_list', {}).items():
+            code_path = pathlib.Path(code)
+            self._entry_list[code_path] = {
+                    'stamp': tuple(entry['stamp']),
+                    'hash': entry['hash'],
+                    'input_stamp': tuple(
+                            (pathlib.Path(input_path),
+                             None if input_stamp is None
+                                  else tuple(input_stamp))
+                            for input_path, input_stamp
+                            in entry.get('input_stamp', [])),
+                    'observation': load_observation(
+                            entry.get('observation')),
+                    'dependence': CodeDependence(
+                            code_path,
+                            tuple(pathlib.Path(file)
+                                  for file in entry['include_files']),
+                            tuple(entry['include_libs']))}
+    
+    def save(self):
+        """削除されたファイルのentryを取り除いた後、cacheファイルに保存"""
+        self.evict()
+        entry_list = {}
+        for code_path in sorted(self._entry_list.keys(), key= path_sort):
+            entry = self._entry_list[code_path]
+            entry_list[code_path.as_posix()] = {
+                    'stamp': list(entry['stamp']),
+                    'hash': entry['hash'],
+                    'input_stamp': [
+                            [input_path.as_posix(),
+                             None if input_stamp is None
+                                  else list(input_stamp)]
+                            for input_path, input_stamp
+                            in entry['input_stamp']],
+                    'observation': save_observation(entry['observation']),
+                    'include_files': [file.as_posix() for file
+                                      in entry['dependence'].include_files],
+                    'include_libs': list(entry['dependence'].include_libs)}
+        data = {'version': self.version,
+                'hash_mode': self._hash_mode,
+                'setting': self._setting,
+                'entry_list': entry_list}
+        with self._file_path.open(mode= 'w', encoding= 'utf-8',
+                                  newline= '') as file:
+            json.dump(data, file, indent= 1)
+    
+    def __str__(self):
+        return '{0}: hit<{1}> miss<{2}> evicted<{3}>'.format(
+                    self.__class__.__name__,
+                    self.hit, self.miss, self.evicted)
+
+def load_observation(data):
+    """JSONから読み込んだinclude関係の観測結果を変換"""
+    if data is None:
+        return None
+    return dict((pathlib.Path(header),
+                 tuple(pathlib.Path(file) for file in include_files))
+                for header, include_files in data.items())
+
+def save_observation(observation):
+    """include関係の観測結果をJSONに変換できる形にする"""
+    if observation is None:
+        return None
+    return dict((header.as_posix(),
+                 [file.as_posix() for file in observation[header]])
+                for header in sorted(observation.keys(), key= path_sort))
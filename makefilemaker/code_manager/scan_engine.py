@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+
+import concurrent.futures
+from .functions import check_dependence
+from .include_resolver import IncludeResolver
+
+# process poolの各processで使用する解析設定
+#   (IncludeResolver, scan_limit)
+_worker_setting = (None, None)
+
+class ScanEngine:
+    """複数のcodeの依存性解析を並列に実行する
+    with文で使用し、終了時にprocess poolを閉じる"""
+    
+    def __init__(self, jobs= 1, include_resolver= None, scan_limit= None):
+        """コンストラクタ
+        jobs            : 並列に実行するprocess数 1以下ならば逐次実行
+        include_resolver: headerを探索するIncludeResolver
+        scan_limit      : 検索を打ち切るプリプロセッサ指令以外の行数"""
+        self._jobs = max(1, jobs)
+        self._include_resolver = (include_resolver
+                                  if not include_resolver is None
+                                  else IncludeResolver())
+        self._scan_limit = scan_limit
+        self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+    
+    def fingerprint(self):
+        """解析設定を表す値"""
+        return {'scanner': 'regex'}
+    
+    def input_files(self, dependence):
+        """解析結果が依存しているcode以外のファイル"""
+        return tuple()
+    
+    def observation(self, code_path):
+        """codeを解析した時に観測されたヘッダファイルのinclude関係
+        正規表現による解析では観測しない"""
+        return None
+    
+    def scan(self, code_path_list):
+        """codeの依存性を解析
+        code_path_list: 対象とするcodeのpathのsequence
+        return (CodeDependence, ...) code_path_listと同じ順"""
+        if self._jobs == 1 or len(code_path_list) < 2:
+            return tuple(check_dependence(code_path,
+                                          self._include_resolver,
+                                          self._scan_limit)
+                         for code_path in code_path_list)
+        if self._executor is None:
+            # 解析設定は各processで一度だけ受け取る
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                        max_workers= self._jobs,
+                        initializer= set_worker_setting,
+                        initargs= (self._include_resolver, self._scan_limit))
+        # mapは入力と同じ順で結果を返すため、結合結果は逐次実行と一致する
+        chunksize = max(1, len(code_path_list) // (self._jobs * 4))
+        return tuple(self._executor.map(check_worker_dependence,
+                                        code_path_list,
+                                        chunksize= chunksize))
+    
+    def shutdown(self):
+        """process poolを閉じる"""
+        if not self._executor is None:
+            self._executor.shutdown()
+            self._executor = None
+
+def set_worker_setting(include_resolver, scan_limit):
+    """process poolの各processで使用する解析設定を設定"""
+    global _worker_setting
+    _worker_setting = (include_resolver, scan_limit)
+
+def check_worker_dependence(code_path):
+    """process poolの各processでcodeの依存性を解析"""
+    return check_dependence(code_path, *_worker_setting)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+import enum
+
+class Scanner(enum.Enum):
+    """依存性解析の方法
+    Regex   : #include を正規表現で検出する
+    Compiler: コンパイラ(-MM)で依存ファイルを列挙する"""
+    Regex    = 'regex'
+    Compiler = 'compiler'
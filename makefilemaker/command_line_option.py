@@ -2,10 +2,16 @@
 
 import sys, argparse
 from .link_object import LinkObjectMode
+from .code_manager import Scanner
+from .makefile_layout import MakefileLayout
+from .build_backend import BuildBackend
+from .precompiled_header import PrecompiledHeaderScope
 
 def option_parser():
     parser = basic_option()
+    code_manager_option(parser)
     link_object_option(parser)
+    makefile_option(parser)
     return parser
 
 def basic_option():
@@ -26,6 +32,12 @@ def basic_option():
         '-c', nargs= argparse.REMAINDER,
         dest= 'compile_option', default= [],
         help= 'add to the compile options all elements of the following');
+    # 並列実行数
+    parser.add_argument(
+        '-j', '--jobs',
+        dest= 'jobs', type= int, default= 1,
+        metavar= 'N',
+        help= 'run N jobs in parallel');
     # version
     parser.add_argument(
         '--version',
@@ -33,6 +45,35 @@ def basic_option():
     # 出力
     return parser
 
+def code_manager_option(parser):
+    # 依存性解析結果のcache
+    parser.add_argument('--scan-cache',
+                        dest= 'scan_cache',
+                        action= 'store',
+                        default= None,
+                        metavar= 'CACHEFILE',
+                        help= 'set the file to cache the include scan results')
+    parser.add_argument('--scan-cache-hash',
+                        dest= 'scan_cache_hash',
+                        action= 'store_true',
+                        default= False,
+                        help= 'compare the content hash of modified files')
+    # 依存性解析の打ち切り
+    parser.add_argument('--scan-limit',
+                        dest= 'scan_limit',
+                        type= int,
+                        default= None,
+                        metavar= 'N',
+                        help= 'stop scanning a file after N lines of code'
+                              ' other than preprocessor directives')
+    # 依存性解析の方法
+    parser.add_argument('--scanner',
+                        dest= 'scanner',
+                        action= 'store',
+                        default= None,
+                        choices= [scanner.value for scanner in Scanner],
+                        help= 'select the include scanner')
+
 def link_object_option(parser):
     # LinkObjectMode
     parser.add_argument('--mode', 
@@ -48,6 +89,66 @@ def link_object_option(parser):
                         default= None,
                         metavar= 'LOGFILE',
                         help= 'set the file to take the log')
+    # 解析結果の保存
+    parser.add_argument('--link-result',
+                        dest= 'link_result',
+                        action= 'store',
+                        default= None,
+                        metavar= 'RESULTFILE',
+                        help= 'set the file to save and reuse '
+                              'the link object analysis')
+    # 試行linkの結果のcache
+    parser.add_argument('--link-cache',
+                        dest= 'link_cache',
+                        action= 'store',
+                        default= None,
+                        metavar= 'CACHEFILE',
+                        help= 'set the file to cache the trial link results')
+    parser.add_argument('--link-cache-size',
+                        dest= 'link_cache_size',
+                        type= int,
+                        default= 10000,
+                        metavar= 'N',
+                        help= 'max number of the cached trial link results')
+
+def makefile_option(parser):
+    # ビルドファイルの種類
+    parser.add_argument('--backend',
+                        dest= 'build_backend',
+                        action= 'store',
+                        default= None,
+                        choices= [backend.value for backend in BuildBackend],
+                        help= 'select the build file to generate')
+    # Makefileの構成
+    parser.add_argument('--layout',
+                        dest= 'makefile_layout',
+                        action= 'store',
+                        default= None,
+                        choices= [layout.value for layout in MakefileLayout],
+                        help= 'select the Makefile layout')
+    # コンパイラが生成する依存関係
+    parser.add_argument('--depfile',
+                        dest= 'depfile',
+                        action= 'store_true',
+                        default= False,
+                        help= 'track header dependencies '
+                              'with compiler-generated .d files')
+    # プリコンパイル済みヘッダ
+    parser.add_argument('--pch',
+                        dest= 'precompiled_header',
+                        type= int,
+                        default= None,
+                        metavar= 'N',
+                        help= 'precompile up to N headers '
+                              'included by many sources')
+    parser.add_argument('--pch-scope',
+                        dest= 'precompiled_header_scope',
+                        action= 'store',
+                        default= PrecompiledHeaderScope.Project.value,
+                        choices= [scope.value
+                                  for scope in PrecompiledHeaderScope],
+                        help= 'share a precompiled header '
+                              'in the project or in each directory')
 
 class LinkObjectModeSelect(argparse.Action):
     def __call__(self, parser, namespace, value, option_string= None):
@@ -40,3 +40,8 @@ class CompilerSetting:
         self.option = CompilerOption(
             notlink, output, include_path, library, library_path)
     
+    def fingerprint(self):
+        """設定を表す文字列
+        設定が変更されたかの判定に用いる"""
+        return repr((self.compiler, tuple(self.option), tuple(self.option_list)))
+    
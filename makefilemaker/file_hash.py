@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+
+def file_hash(path, chunk_size= 1 << 16):
+    """ファイルの内容のhash値(sha256)を16進文字列で返す
+    path      : 対象とするファイルのpath
+    chunk_size: 一度に読み込むbyte数"""
+    hash_object = hashlib.sha256()
+    with path.open(mode= 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            hash_object.update(chunk)
+    return hash_object.hexdigest()
+
+def file_stamp(path):
+    """ファイルの更新時刻とサイズの組を返す
+    ファイルが存在しなければNoneを返す"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+import tempfile
+from .file_hash import file_hash
+
+def write_if_changed(file_path, text):
+    """内容が変化した場合のみファイルに書き込む
+    一時ファイルに書き込んだ後にrenameすることで、atomicに置き換える
+    file_path: 書き込むファイルのpath
+    text     : 書き込む内容
+    return 書き込んだならばTrue, 内容が同じならばFalse"""
+    data = text.encode('utf-8')
+    try:
+        if file_hash(file_path) == hashlib.sha256(data).hexdigest():
+            return False
+    except OSError:# ファイルが存在しない
+        pass
+    replace_file(file_path, data)
+    return True
+
+def replace_file(file_path, data):
+    """一時ファイルを経由してファイルをatomicに置き換える
+    file_path: 置き換えるファイルのpath
+    data     : 書き込む内容(bytes)"""
+    temp_fd, temp_name = tempfile.mkstemp(
+                dir= str(file_path.parent),
+                prefix= '.{0}.'.format(file_path.name),
+                suffix= '.tmp')
+    try:
+        with os.fdopen(temp_fd, mode= 'wb') as file:
+            file.write(data)
+        os.chmod(temp_name, file_mode(file_path))
+        os.replace(temp_name, str(file_path))
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+def file_mode(file_path):
+    """置き換えるファイルのpermission
+    存在しなければumaskに従った通常のファイルのpermission"""
+    try:
+        return file_path.stat().st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def write_lines_if_changed(file_path, lines, buffer_size= 1 << 16):
+    """行を逐次既存のファイルと比較し、内容が変化した場合のみ置き換える
+    一致しない部分が見つかるまで一時ファイルは作成せず、
+    一致した先頭部分は既存のファイルから一時ファイルに複製する
+    行は改行で結合され、末尾には改行を付けない
+    file_path  : 書き込むファイルのpath
+    lines      : 書き込む行のiterable
+    buffer_size: 比較, 書き込みの単位となる大きさ
+    return 書き込んだならばTrue, 内容が同じならばFalse"""
+    chunk_iter = line_chunks(lines, buffer_size)
+    matched_size = 0
+    pending = b''
+    try:
+        old_file = open(str(file_path), mode= 'rb')
+    except OSError:# ファイルが存在しない
+        old_file = None
+    if not old_file is None:
+        with old_file:
+            for chunk in chunk_iter:
+                if old_file.read(len(chunk)) != chunk:
+                    pending = chunk
+                    break
+                matched_size += len(chunk)
+            else:
+                if len(old_file.read(1)) == 0:# 内容が同じ
+                    return False
+    # 一時ファイルに書き込み、置き換える
+    temp_fd, temp_name = tempfile.mkstemp(
+                dir= str(file_path.parent),
+                prefix= '.{0}.'.format(file_path.name),
+                suffix= '.tmp')
+    try:
+        with os.fdopen(temp_fd, mode= 'wb', buffering= buffer_size) as file:
+            if matched_size != 0:
+                copy_head(file_path, file, matched_size, buffer_size)
+            file.write(pending)
+            for chunk in chunk_iter:
+                file.write(chunk)
+        os.chmod(temp_name, file_mode(file_path))
+        os.replace(temp_name, str(file_path))
+        return True
+    finally:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+def line_chunks(lines, chunk_size):
+    """行を改行で結合し、chunk_size程度の大きさのbytesに分けて返す"""
+    buffer = []
+    buffer_size = 0
+    separator = b''
+    for line in lines:
+        data = separator + line.encode('utf-8')
+        buffer.append(data)
+        buffer_size += len(data)
+        separator = b'\n'
+        if buffer_size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            buffer_size = 0
+    if buffer_size != 0:
+        yield b''.join(buffer)
+
+def copy_head(file_path, output_file, size, buffer_size):
+    """ファイルの先頭size byteをoutput_fileに複製する"""
+    with open(str(file_path), mode= 'rb') as input_file:
+        while size > 0:
+            data = input_file.read(min(size, buffer_size))
+            if len(data) == 0:
+                break
+            output_file.write(data)
+            size -= len(data)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from .makefile_generator \
+import MakefileGenerator, MakefileMacroName, target_format, precompile_rule
+from .path_function      import path_to_string
+from .file_writer        import write_lines_if_changed
+
+# ディレクトリ毎のルールを書き込むファイル名
+fragment_name = 'Makefile.mk'
+
+class FragmentGenerator(MakefileGenerator):
+    """ディレクトリ毎のルールをrootのMakefileからincludeされる断片とする
+    makeはrootで実行されるため、pathはrootを基準とする
+    マクロは各断片から追加される"""
+    macro_operator = '+='
+    
+    def __init__(self,
+                 dir_path,
+                 build_data_list,
+                 build_comamnd_maker,
+                 root_path,
+                 depfile= False):
+        """コンストラクタ
+        dir_path           : 断片を生成するディレクトリ
+        build_data_list    : ビルド情報
+        build_command_maker: BuildCommandMaker
+        root_path          : makeを実行するrootディレクトリ
+        depfile            : コンパイラが生成する依存関係(.d)を用いるか"""
+        super().__init__(root_path,
+                         build_data_list,
+                         build_comamnd_maker,
+                         depfile= depfile)
+        self._fragment_dir = dir_path
+    
+    def fragment_path(self):
+        """断片のpath"""
+        return self._fragment_dir.joinpath(fragment_name)
+    
+    def make(self):
+        """断片を生成
+        return 書き込んだならばTrue"""
+        return write_lines_if_changed(self.fragment_path(), self.make_code())
+    
+    def make_code(self):
+        """断片のコードを1行ずつ生成
+        all, clean はrootのMakefileが生成する"""
+        # MACRO宣言
+        yield from self.macro_programs()
+        yield from self.macro_objects()
+        yield from self.macro_depends()
+        # link
+        yield from self.link_rule()
+        # compile
+        yield from self.compile_rule()
+        # header依存
+        yield from self.dependent_header()
+        yield from self.precompiled_header_dependence()
+
+class FragmentRootGenerator:
+    """断片をincludeするrootのMakefileを生成"""
+    
+    def __init__(self,
+                 root_path,
+                 fragment_list,
+                 depfile= False,
+                 build_command_maker= None,
+                 precompiled_header_list= tuple()):
+        """コンストラクタ
+        root_path    : Makefileを生成するrootディレクトリ
+        fragment_list: includeする断片のpathのsequence
+        depfile      : コンパイラが生成する依存関係(.d)を用いるか
+        build_command_maker
+                     : BuildCommandMaker
+                         プリコンパイル済みヘッダのcommandに使用
+        precompiled_header_list
+                     : 作成するプリコンパイル済みヘッダ"""
+        self._root_path = root_path
+        self._fragment_list = fragment_list
+        self._depfile = depfile
+        self._build_command_maker = build_command_maker
+        self._precompiled_header_list = precompiled_header_list
+    
+    def make(self):
+        """Makefileを生成
+        return 書き込んだならばTrue"""
+        makefile = self._root_path.joinpath('Makefile')
+        return write_lines_if_changed(makefile, self.make_code())
+    
+    def make_code(self):
+        """Makefileのコードを1行ずつ生成"""
+        macro_list = [MakefileMacroName.objects, MakefileMacroName.programs]
+        # 断片のruleより先に宣言し、default goalとする
+        yield '.PHONY: all'
+        yield from target_format('all')
+        yield ''
+        # 断片
+        for fragment in self._fragment_list:
+            yield 'include {0}'.format(
+                        path_to_string(fragment, self._root_path))
+        yield ''
+        # all
+        #   断片で追加されたマクロを参照する
+        yield from target_format(
+                'all',
+                [' '.join('$({0})'.format(macro) for macro in macro_list)])
+        yield ''
+        # プリコンパイル済みヘッダ
+        for precompiled_header in self._precompiled_header_list:
+            yield from precompile_rule(precompiled_header,
+                                       self._build_command_maker,
+                                       self._root_path)
+            yield ''
+        # clean
+        if self._depfile:
+            macro_list.append(MakefileMacroName.depends)
+        rm_target = ['$({0})'.format(macro) for macro in macro_list]
+        rm_target.extend(path_to_string(precompiled_header.gch_path,
+                                        self._root_path)
+                         for precompiled_header
+                         in self._precompiled_header_list)
+        yield '.PHONY: clean'
+        yield from target_format('clean')
+        yield '\trm -f {0}'.format(' '.join(rm_target))
+        yield ''
+        # コンパイラが生成した依存関係
+        if self._depfile:
+            yield '-include $({0})'.format(MakefileMacroName.depends)
+            yield ''
+    
+    def __repr__(self):
+        return '{0}({1})'.format(
+                   self.__class__.__name__,
+                   ', '.join('{0}= {1}'.format(key, getattr(self, key))
+                             for key in sorted(self.__dict__.keys())))
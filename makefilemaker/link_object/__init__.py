@@ -2,3 +2,4 @@
 
 from .main import LinkObject
 from .mode import LinkObjectMode
+from .link_cache import LinkCache
@@ -12,18 +12,29 @@ def build_test(build_data, build_command_maker, log_file= subprocess.DEVNULL):
     return return_code 0 -> 正常終了
                        1 -> 異常終了"""
     command = build_command_maker.link_command(build_data)
-    if log_file != subprocess.DEVNULL:
-        log_file.write('{0}\n\n'.format(command))
+    return_code, output = run_link(command)
+    write_link_log(log_file, command, output)
+    return return_code
+
+def run_link(command):
+    """linkコマンドを実行
+    command: linkコマンド
+    return (return_code, output) outputは異常終了時の出力, 正常終了時はNone"""
     try:
         subprocess.check_output(shlex.split(command),
                                 stderr= subprocess.STDOUT)
     except subprocess.CalledProcessError as error:
-        return_code = error.returncode
-        if log_file != subprocess.DEVNULL:
-            log_file.write('{0}\n\n'.format(error.output.decode('utf-8')))
-    else:
-        return_code = 0
-    return return_code
+        return (error.returncode, error.output.decode('utf-8'))
+    return (0, None)
+
+def write_link_log(log_file, command, output):
+    """linkコマンドとその出力をlog fileに書き込む
+    log_file: subprocess.DEVNULLならば書き込まない"""
+    if log_file == subprocess.DEVNULL:
+        return
+    log_file.write('{0}\n\n'.format(command))
+    if not output is None:
+        log_file.write('{0}\n\n'.format(output))
 
 def make_build_test_data(object_list, build_data_list):
     """ビルドテスト用のProgramBuildDataを作成"""
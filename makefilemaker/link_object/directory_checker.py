@@ -3,7 +3,8 @@
 import pathlib
 import subprocess
 from .functions         import source_to_object
-from .checker_functions import build_test, make_build_test_data
+from .checker_functions import make_build_test_data
+from .trial_executor    import TrialLinkExecutor
 from ..path_function import path_to_string, path_sort
 
 class DirectoryChecker:
@@ -12,12 +13,18 @@ class DirectoryChecker:
                  source_code_list,
                  build_data_list,
                  build_command_maker,
-                 verbose= False):
-        """コンストラクタ"""
+                 verbose= False,
+                 jobs= 1,
+                 link_cache= None):
+        """コンストラクタ
+        jobs      : 同時に実行する試行linkの数
+        link_cache: LinkCache Noneならばcacheしない"""
         self._source_code_list = source_code_list
         self._build_data_list = build_data_list
         self._build_command_maker = build_command_maker
         self._verbose = verbose
+        self._jobs = jobs
+        self._link_cache = link_cache
         # ソースコードのディレクトリ
         dir_list = [source.parent for source in source_code_list]
         self._dir_list = tuple(sorted(set(dir_list),
@@ -31,9 +38,7 @@ class DirectoryChecker:
     def analyze(self):
         if self._verbose:# 表示
             print('DirectoryChecker analyze')
-        for dir in self._dir_list:
-            if self._verbose:# 試行する除外directory
-                print('test removed dir: {0}'.format(path_to_string(dir)))
+        def make_trial(dir):
             # 除外directory設定
             removed_dir_list = self._removed_dir_list.copy()
             removed_dir_list.append(dir)
@@ -42,21 +47,24 @@ class DirectoryChecker:
                         self._source_code_list, removed_dir_list)
             object_list = source_to_object(source_code_list,
                                            self._build_data_list)
-            build_data  = make_build_test_data(object_list,
-                                               self._build_data_list)
-            # ビルド試行
-            return_code = build_test(build_data,
-                                    self._build_command_maker,
-                                    self._analyze_log)
-            if self._verbose:# 試行結果表示
+            return make_build_test_data(object_list, self._build_data_list)
+        def report(dir, return_code):
+            if self._verbose:# 試行した除外directoryと結果を表示
+                print('test removed dir: {0}'.format(path_to_string(dir)))
                 print('  ReturnCode<{0}>: {1}'.format(
                             return_code,
                             'Success' if return_code == 0 else 'Failed'))
-            if return_code == 0:
-                # 試行に成功したならば除外対象に追加
-                self._removed_dir_list.append(dir)
-                if self._verbose:
-                    print('  remove: {0}'.format(path_to_string(dir)))
+        def commit(dir):
+            # 試行に成功したならば除外対象に追加
+            self._removed_dir_list.append(dir)
+            if self._verbose:
+                print('  remove: {0}'.format(path_to_string(dir)))
+        # ビルド試行
+        with TrialLinkExecutor(self._build_command_maker,
+                               self._jobs,
+                               self._analyze_log,
+                               self._link_cache) as executor:
+            executor.analyze(self._dir_list, make_trial, commit, report)
         if self._verbose:# 空行挿入
             print()
     
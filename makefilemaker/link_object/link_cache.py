@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import re
+import json
+import pathlib
+import hashlib
+from collections import OrderedDict
+from ..file_hash import file_hash, file_stamp
+
+class LinkCache:
+    """試行linkの結果の永続cache
+    オブジェクトの集合, 各オブジェクトの内容, linkコマンド,
+    コンパイラ設定から求めたfingerprintをkeyとする
+    保持する数は上限を超えると最も古く使われたものから取り除かれる"""
+    version = 2
+    
+    def __init__(self, file_path, max_size= 10000):
+        """コンストラクタ
+        file_path: cacheを保存するファイルのpath
+        max_size : 保持する試行結果の上限"""
+        self._file_path = pathlib.Path(file_path)
+        self._max_size = max(1, max_size)
+        # {fingerprint: return_code, ...} 最近使われたものほど後ろ
+        self._entry_list = OrderedDict()
+        # オブジェクトの内容のhash値
+        #   {object_path: ((mtime_ns, size), hash), ...}
+        self._object_hash = {}
+        # 統計
+        self.hit  = 0
+        self.miss = 0
+        self.load()
+    
+    def fingerprint(self, build_data, build_command_maker):
+        """試行linkのfingerprintを求める
+        出力先は試行毎に異なるため、a.outとして扱う
+        build_data         : ProgramBuildData
+        build_command_maker: BuildCommandMaker"""
+        hash_object = hashlib.sha256()
+        hash_object.update(build_command_maker.compiler_setting
+                           .fingerprint().encode('utf-8'))
+        hash_object.update(b'\0')
+        hash_object.update(build_command_maker.link_command(
+                    build_data._replace(program_path= pathlib.Path('a.out')))
+                    .encode('utf-8'))
+        for object_path in build_data.link_objects:
+            hash_object.update(b'\0')
+            hash_object.update(self.object_hash(object_path).encode('utf-8'))
+        return hash_object.hexdigest()
+    
+    def object_hash(self, object_path):
+        """オブジェクトの内容のhash値
+        更新時刻, サイズが変わらない限り再計算しない"""
+        stamp = file_stamp(object_path)
+        if stamp is None:
+            return ''
+        cached = self._object_hash.get(object_path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, file_hash(object_path))
+            self._object_hash[object_path] = cached
+        return cached[1]
+    
+    def lookup(self, fingerprint):
+        """cacheされた試行結果(return_code)を返す
+        見つからなければNoneを返す"""
+        return_code = self._entry_list.get(fingerprint)
+        if return_code is None:
+            self.miss += 1
+            return None
+        self._entry_list.move_to_end(fingerprint)
+        self.hit += 1
+        return return_code
+    
+    def store(self, fingerprint, return_code, output= None):
+        """試行結果を登録
+        失敗した試行は、リンカが正常に終了しシンボルの解決に失敗した場合のみ
+        登録し、一時的な失敗(異常終了, ディスク容量不足等)は登録しない
+        output: 失敗した試行のリンカの出力"""
+        if return_code != 0 and not is_link_error(return_code, output):
+            return
+        self.add_entry(fingerprint, return_code)
+    
+    def add_entry(self, fingerprint, return_code):
+        """試行結果を最も新しいものとして追加"""
+        self._entry_list[fingerprint] = return_code
+        self._entry_list.move_to_end(fingerprint)
+        while len(self._entry_list) > self._max_size:
+            self._entry_list.popitem(last= False)
+    
+    def load(self):
+        """cacheファイルを読み込む
+        存在しない, もしくはversionが異なる場合は空のcacheとする"""
+        self._entry_list = OrderedDict()
+        try:
+            with self._file_path.open(encoding= 'utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.version:
+            return
+        for fingerprint, return_code in data.get('entry_list', []):
+            self.add_entry(fingerprint, return_code)
+    
+    def save(self):
+        """cacheファイルに保存"""
+        data = {'version': self.version,
+                'entry_list': list(self._entry_list.items())}
+        with self._file_path.open(mode= 'w', encoding= 'utf-8',
+                                  newline= '') as file:
+            json.dump(data, file, indent= 1)
+    
+    def hit_rate(self):
+        """cacheのhit率"""
+        total = self.hit + self.miss
+        return 0.0 if total == 0 else self.hit / total
+    
+    def __str__(self):
+        return '{0}: hit<{1}> miss<{2}> rate<{3:.1%}>'.format(
+                    self.__class__.__name__,
+                    self.hit, self.miss, self.hit_rate())
+
+def is_link_error(return_code, output):
+    """試行linkの失敗がシンボルの解決の失敗によるものか
+    リンカがsignalで終了した場合(return_code < 0)は含まない"""
+    if return_code <= 0 or output is None:
+        return False
+    return not link_error_regex.search(output) is None
+
+# シンボルの解決の失敗を表すリンカの出力
+#   GNU ld, gold, lld, macOSのld
+link_error_regex = re.compile(
+            r'undefined reference to'
+            r'|multiple definition of'
+            r'|undefined symbol'
+            r'|duplicate symbol'
+            r'|Undefined symbols for architecture',
+            re.IGNORECASE)
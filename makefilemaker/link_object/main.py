@@ -1,12 +1,20 @@
 # -*- coding: utf-8 -*-
 import copy
+import json
+import pathlib
+import hashlib
 from ..build_data    import BuildData, ProgramBuildData
+from ..file_hash     import file_hash
 from ..path_function import path_to_string, path_sort
 from .functions \
 import get_source_code_list, source_to_object, object_to_include_libs
 from .source_tree_maker   import SourceTreeMaker
 from .source_tree_checker import SourceTreeChecker
 from .directory_checker   import DirectoryChecker
+from .minimizer           import SourceSetMinimizer
+from .symbol_resolver     import SymbolResolver
+from .checker_functions   import make_build_test_data
+from .mode                import LinkObjectMode
 
 class LinkObject:
     """リンクするオブジェクトファイルを設定
@@ -15,9 +23,11 @@ class LinkObject:
                  build_data_list,
                  code_manager,
                  build_command_maker,
-                 verbose= False):
+                 verbose= False,
+                 jobs= 1):
         """main_code_list: main関数のソースコードのリスト
-        code_manager  : CodeManager"""
+        code_manager  : CodeManager
+        jobs          : 同時に実行する試行linkの数"""
         self._build_data_list  = build_data_list
         self._main_code_list   = code_manager.main_code
         self._source_code_list = code_manager.source_code
@@ -26,14 +36,33 @@ class LinkObject:
         # verbose mode設定
         self._verbose          = verbose
         self._super_verbose    = False
+        # 試行linkの並列数
+        self._jobs             = jobs
         # 解析結果
         #   {main_code: (object_path, ...), ...}
         self._object_path = {}
+        #   {main_code: (unresolved_symbol, ...), ...}
+        self._unresolved_symbol = {}
         # SourceTreeCheckerのlog file
         self._log_file = None
+        # 試行linkの結果のcache
+        self._link_cache = None
+        # 各main_codeの解析の入力のfingerprint
+        #   解析結果を保存, 再利用する場合(loadを呼んだ後)のみ計算する
+        #   {main_code: fingerprint, ...}
+        self._use_fingerprint = False
+        self._fingerprint = {}
+        # loadした解析結果
+        #   {main_code: (fingerprint, (object_path, ...),
+        #                (unresolved_symbol, ...)), ...}
+        self._loaded_data = {}
+        # 入力のfingerprintの計算に用いるファイルのhash値
+        #   {file_path: hash, ...}
+        self._file_hash = {}
     
     def search(self):
-        for main_code in self._main_code_list:
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.Search):
             # SourceTreeを作成
             tree_maker = SourceTreeMaker(
                         main_code, self._code_manager,
@@ -49,7 +78,8 @@ class LinkObject:
         その結果、最小限のオブジェクトをリンク対象とする
         実際にビルドを行おうとするため、
         全てのオブジェクトファイルが生成されていることを前提とする"""
-        for main_code in self._main_code_list:
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.Analyze):
             source_code_list = analyze_step(self, main_code)
             # 解析結果をobjectへ
             self._object_path[main_code] = source_to_object(
@@ -57,7 +87,8 @@ class LinkObject:
     
     def full_analyze(self):
         """analyzeを除外対象がなくなるまで実行する"""
-        for main_code in self._main_code_list:
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.FullAnalyze):
             source_code_list = analyze_step(self, main_code)
             prev_source_code_list = copy.deepcopy(source_code_list)
             while True:
@@ -71,9 +102,84 @@ class LinkObject:
             self._object_path[main_code] = source_to_object(
                         source_code_list, self._build_data_list)
     
+    def minimize(self):
+        """SourceTreeに含まれるソースコードをddminにより最小化する
+        不必要なオブジェクトが多い場合、試行linkの回数は
+        オブジェクト数に対しておよそ対数となる
+        analyzeと同様に全てのオブジェクトファイルが生成されていることを前提とする"""
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.Minimize):
+            if self._verbose:# 解析対象を表示
+                print('LinkObject Minimize: {0}'.format(
+                            path_to_string(main_code)))
+            # SourceCodeTreeを作成
+            tree_maker = SourceTreeMaker(
+                        main_code, self._code_manager,
+                        verbose= self._super_verbose)
+            tree_maker.make()
+            source_tree = tree_maker.source_tree()
+            if self._verbose:# SourceTreeを表示
+                print(source_tree)
+                print()
+            # 最小化
+            minimizer = SourceSetMinimizer(
+                        main_code,
+                        source_tree.node_list(depth_sort= True),
+                        self._build_data_list,
+                        self._build_command_maker,
+                        verbose= self._verbose,
+                        jobs= self._jobs,
+                        link_cache= self._link_cache)
+            if not self._log_file is None:# log file設定
+                minimizer.set_log_file(self._log_file)
+            minimizer.minimize()
+            # 解析結果をobjectへ
+            self._object_path[main_code] = source_to_object(
+                        minimizer.source_code_list(), self._build_data_list)
+    
+    def symbols(self):
+        """オブジェクトファイルのシンボルの定義, 参照関係から
+        リンクに必要なオブジェクトを求める
+        リンクを試行しないが、全てのオブジェクトファイルが
+        生成されていることを前提とする"""
+        resolver = SymbolResolver(jobs= self._jobs)
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.Symbols):
+            source_list = get_source_code_list(main_code, self._code_manager)
+            object_list, unresolved_list = resolver.resolve(
+                        self._build_data_list[main_code].object_path,
+                        source_to_object(source_list, self._build_data_list))
+            self._object_path[main_code] = object_list
+            self._unresolved_symbol[main_code] = unresolved_list
+            if self._verbose:# 解析結果を表示
+                print('LinkObject Symbols: {0}'.format(
+                            path_to_string(main_code)))
+                print('  objects:')
+                for object_path in object_list:
+                    print('    {0}'.format(path_to_string(object_path)))
+                print('  unresolved symbols:')
+                for name in unresolved_list:
+                    print('    {0}'.format(name))
+                print()
+            if not self._log_file is None:# logに未解決のシンボルを記録
+                with self._log_file.open(mode= 'a', encoding= 'utf-8',
+                                         newline= '') as log_file:
+                    log_file.write('unresolved symbols<{0}>\n'.format(
+                                path_to_string(main_code)))
+                    log_file.writelines('  {0}\n'.format(name)
+                                        for name in unresolved_list)
+                    log_file.write('\n')
+    
+    def unresolved_symbol(self):
+        """symbolsで解決されなかったシンボルを出力
+        {main_code: (symbol, ...), ...}
+        ライブラリによって解決されるべきシンボル"""
+        return self._unresolved_symbol.copy()
+    
     def all(self):
         """リンク対象となりうる全てのオブジェクトを"""
-        for main_code in self._main_code_list:
+        for main_code in self.target_main_code_list(
+                    LinkObjectMode.All):
             source_list = get_source_code_list(main_code, self._code_manager)
             object_list = source_to_object(source_list, self._build_data_list)
             self._object_path[main_code] = object_list
@@ -107,14 +213,142 @@ class LinkObject:
                         object_list)
         return build_data
     
+    def target_main_code_list(self, mode):
+        """解析が必要なmain_codeを返す
+        loadした解析結果のうち入力が変化していないものはそのまま用いる
+        mode: 解析に用いるLinkObjectMode"""
+        if not self._use_fingerprint:# 解析結果を再利用しない
+            return tuple(self._main_code_list)
+        target_list = []
+        for main_code in self._main_code_list:
+            fingerprint = input_fingerprint(self, main_code, mode)
+            self._fingerprint[main_code] = fingerprint
+            loaded_data = self._loaded_data.get(main_code)
+            if not loaded_data is None and loaded_data[0] == fingerprint:
+                self._object_path[main_code] = loaded_data[1]
+                if mode is LinkObjectMode.Symbols:
+                    self._unresolved_symbol[main_code] = loaded_data[2]
+                if self._verbose:# 再利用した解析結果を表示
+                    print('LinkObject Reuse: {0}'.format(
+                                path_to_string(main_code)))
+            else:
+                target_list.append(main_code)
+        return tuple(target_list)
+    
     def save(self, filepath):
-        pass
+        """解析結果を入力のfingerprintと共に保存
+        fingerprintはloadを呼んだ後の解析でのみ計算されるため、
+        それ以外の解析結果は保存されない
+        filepath: 保存するファイルのpath"""
+        program_list = {}
+        for main_code in sorted(self._object_path.keys(), key= path_sort):
+            if not main_code in self._fingerprint:
+                continue
+            program_list[main_code.as_posix()] = {
+                    'fingerprint': self._fingerprint[main_code],
+                    'object_list': [object_path.as_posix() for object_path
+                                    in self._object_path[main_code]],
+                    'unresolved_symbol': list(
+                                self._unresolved_symbol.get(main_code, ()))}
+        data = {'version': result_version,
+                'program_list': program_list}
+        with pathlib.Path(filepath).open(mode= 'w', encoding= 'utf-8',
+                                         newline= '') as file:
+            json.dump(data, file, indent= 1)
     
     def load(self, filepath):
-        pass
+        """保存された解析結果を読み込む
+        入力が変化していないmain_codeは解析時にその結果を用いる
+        以降の解析では入力のfingerprintを計算する
+        ファイルが存在しない, もしくはversionが異なる場合は読み込まない
+        filepath: 保存されたファイルのpath"""
+        self._use_fingerprint = True
+        try:
+            with pathlib.Path(filepath).open(encoding= 'utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != result_version:
+            return
+        for main_code, entry in data.get('program_list', {}).items():
+            self._loaded_data[pathlib.Path(main_code)] = (
+                    entry['fingerprint'],
+                    tuple(pathlib.Path(object_path)
+                          for object_path in entry['object_list']),
+                    tuple(entry['unresolved_symbol']))
     
     def set_log_file(self, log_file_path):
         self._log_file = log_file_path
+    
+    def set_link_cache(self, link_cache):
+        """試行linkの結果のcacheを設定
+        link_cache: LinkCache"""
+        self._link_cache = link_cache
+
+# LinkObject.saveで保存する形式のversion
+result_version = 2
+
+def input_fingerprint(self, main_code, mode):
+    """main_codeの解析結果が依存する入力のfingerprint
+    LinkObjectModeごとに解析結果が実際に依存する入力から求める
+        Search : SourceTreeに含まれるソースコードとそのinclude (構造のみ)
+        All    : リンク対象となりうるソースコード (構造のみ)
+        Analyze, FullAnalyze, Minimize:
+                 SourceTreeに含まれるソースコードとそのヘッダファイルの内容,
+                 それらをリンクする際のコマンド
+        Symbols: リンク対象となりうるソースコードとそのヘッダファイルの内容,
+                 全てをリンクする際のコマンド
+    self     : LinkObject
+    main_code: mainとなるcode
+    mode     : LinkObjectMode"""
+    if mode is LinkObjectMode.Symbols or mode is LinkObjectMode.All:
+        source_code_list = get_source_code_list(main_code, self._code_manager)
+    else:
+        # 解析はSourceTreeに含まれるソースコードに限られる
+        tree_maker = SourceTreeMaker(main_code, self._code_manager)
+        tree_maker.make()
+        source_code_list = sorted(tree_maker.source_tree().node_list(),
+                                  key= path_sort)
+    use_content = not (mode is LinkObjectMode.Search
+                       or mode is LinkObjectMode.All)
+    hash_object = hashlib.sha256()
+    hash_object.update(mode.value.encode('utf-8'))
+    if use_content:
+        hash_object.update(b'\0')
+        hash_object.update(self._build_command_maker.compiler_setting
+                           .fingerprint().encode('utf-8'))
+        hash_object.update(b'\0')
+        hash_object.update(self._build_command_maker.link_command(
+                    make_build_test_data(
+                            source_to_object(source_code_list,
+                                             self._build_data_list),
+                            self._build_data_list)).encode('utf-8'))
+    for source in source_code_list:
+        hash_object.update(b'\0')
+        hash_object.update(source.as_posix().encode('utf-8'))
+        if mode is LinkObjectMode.All:
+            continue
+        for file in (source,) + tuple(
+                    self._build_data_list[source].include_files):
+            hash_object.update(b'\0')
+            hash_object.update(file.as_posix().encode('utf-8'))
+            if use_content:
+                hash_object.update(b'\0')
+                hash_object.update(cached_file_hash(self, file)
+                                   .encode('utf-8'))
+    return hash_object.hexdigest()
+
+def cached_file_hash(self, file):
+    """fileの内容のhash (LinkObject内でcacheする)
+    読み込めない場合は空文字列
+    self: LinkObject
+    file: 対象のpath"""
+    if not file in self._file_hash:
+        try:
+            self._file_hash[file] = file_hash(file)
+        except OSError:
+            self._file_hash[file] = ''
+    return self._file_hash[file]
 
 def analyze_step(self, main_code, source_code_list= None):
     """LinkObject.analyzeの手続き
@@ -142,7 +376,9 @@ def analyze_step(self, main_code, source_code_list= None):
                 source_tree.node_list(depth_sort= True),
                 self._build_data_list,
                 self._build_command_maker,
-                verbose= self._verbose)
+                verbose= self._verbose,
+                jobs= self._jobs,
+                link_cache= self._link_cache)
     if not self._log_file is None:# log file設定
         dir_checker.set_log_file(self._log_file)
     dir_checker.analyze()
@@ -163,7 +399,9 @@ def analyze_step(self, main_code, source_code_list= None):
                 source_tree,
                 self._build_data_list,
                 self._build_command_maker,
-                verbose= self._verbose)
+                verbose= self._verbose,
+                jobs= self._jobs,
+                link_cache= self._link_cache)
     if not self._log_file is None:# log file設定
         tree_checker.set_log_file(self._log_file)
     tree_checker.analyze()
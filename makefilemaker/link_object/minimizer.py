@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+from .functions         import source_to_object
+from .checker_functions import make_build_test_data, write_link_log
+from .trial_executor    import TrialLinkExecutor
+from ..path_function   import path_to_string, path_sort
+
+class SourceSetMinimizer:
+    """ddmin(delta debugging)によりリンクするソースコードを最小化する
+    候補を分割した塊毎に取り除くことを試み、
+    成功すれば塊を一度に取り除く, 失敗し続ければ分割を細かくする"""
+    
+    def __init__(self,
+                 main_code,
+                 source_code_list,
+                 build_data_list,
+                 build_command_maker,
+                 verbose= False,
+                 jobs= 1,
+                 link_cache= None):
+        """コンストラクタ
+        main_code          : mainとなるsource code 取り除かれない
+        source_code_list   : 対象となるsource code
+        build_data_list    : BuildDataのリスト
+        build_command_maker: BuildCommandMaker
+        verbose            : verbose mode True or False
+        jobs               : 同時に実行する試行linkの数
+        link_cache         : LinkCache Noneならばcacheしない"""
+        self._main_code = main_code
+        self._source_code_list = tuple(source for source in source_code_list
+                                       if source != main_code)
+        self._build_data_list = build_data_list
+        self._build_command_maker = build_command_maker
+        self._verbose = verbose
+        self._jobs = jobs
+        self._link_cache = link_cache
+        # build_test時のlog file
+        self._analyze_log = subprocess.DEVNULL
+    
+    def minimize(self):
+        if self._verbose:# 表示
+            print('SourceSetMinimizer minimize')
+        candidate_list = list(self._source_code_list)
+        def make_trial(chunk):
+            removed_set = set(chunk)
+            return self.make_build_data(
+                        source for source in candidate_list
+                        if not source in removed_set)
+        def report(chunk, return_code):
+            if self._verbose:# 試行した除外対象と結果を表示
+                print('test removed chunk:')
+                for source in chunk:
+                    print('  {0}'.format(path_to_string(source)))
+                print('  ReturnCode<{0}>: {1}'.format(
+                            return_code,
+                            'Success' if return_code == 0 else 'Failed'))
+        removed_chunk_list = []
+        def commit(chunk):
+            # 試行に成功したならば塊ごと取り除く
+            removed_set = set(chunk)
+            candidate_list[:] = [source for source in candidate_list
+                                 if not source in removed_set]
+            removed_chunk_list.append(chunk)
+        with TrialLinkExecutor(self._build_command_maker,
+                               self._jobs,
+                               self._analyze_log,
+                               self._link_cache) as executor:
+            # 全てをリンクして成功しなければ最小化できない
+            (return_code, command, output), = executor.run(
+                        [self.make_build_data(candidate_list)])
+            write_link_log(self._analyze_log, command, output)
+            if return_code != 0:
+                if self._verbose:
+                    print('  link with all sources failed')
+                    print()
+                return
+            granularity = 2
+            while len(candidate_list) != 0:
+                granularity = min(granularity, len(candidate_list))
+                if self._verbose:# 分割数を表示
+                    print('granularity: {0}'.format(granularity))
+                removed_chunk_list.clear()
+                executor.analyze(split_list(candidate_list, granularity),
+                                 make_trial, commit, report)
+                if len(removed_chunk_list) != 0:
+                    # 取り除いた塊の分だけ分割を粗くする
+                    granularity = max(
+                                granularity - len(removed_chunk_list), 2)
+                elif granularity < len(candidate_list):
+                    # 分割を細かくする
+                    granularity = min(granularity * 2, len(candidate_list))
+                else:
+                    # 1つずつ取り除いても成功しない
+                    break
+        self._source_code_list = tuple(candidate_list)
+        if self._verbose:# 表示
+            print()
+    
+    def make_build_data(self, source_code_list):
+        """main_codeとsource_code_listをリンクするビルド情報を作成"""
+        code_list = [self._main_code]
+        code_list.extend(source_code_list)
+        object_list = source_to_object(code_list, self._build_data_list)
+        return make_build_test_data(object_list, self._build_data_list)
+    
+    def source_code_list(self):
+        """ソースコードのリストを返す
+        不必要だとされたソースコードは除外されている"""
+        code_list = [self._main_code]
+        code_list.extend(self._source_code_list)
+        return tuple(sorted(code_list, key= path_sort))
+    
+    def set_log_file(self, log_file_path):
+        """build_test時のlog fileを設定する
+        設定しなければlogは取らない
+        log_file_path: pathlib.Path"""
+        self._analyze_log = log_file_path.open(
+                    mode= 'a', encoding= 'utf-8', newline= '')
+
+def split_list(code_list, number):
+    """code_listを順序を保ったままnumber個の塊に分割する"""
+    size, remainder = divmod(len(code_list), number)
+    chunk_list = []
+    start = 0
+    for i in range(number):
+        end = start + size + (1 if i < remainder else 0)
+        chunk_list.append(tuple(code_list[start:end]))
+        start = end
+    return tuple(chunk_list)
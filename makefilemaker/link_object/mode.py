@@ -7,3 +7,5 @@ class LinkObjectMode(enum.Enum):
     All         = 'all'
     Analyze     = 'analyze'
     FullAnalyze = 'full-analyze'
+    Minimize    = 'minimize'
+    Symbols     = 'symbols'
@@ -3,7 +3,8 @@
 import pathlib
 import subprocess
 from .functions         import source_to_object
-from .checker_functions import build_test, make_build_test_data
+from .checker_functions import make_build_test_data
+from .trial_executor    import TrialLinkExecutor
 from ..path_function   import path_to_string, path_sort
 
 class SourceTreeChecker:
@@ -11,50 +12,59 @@ class SourceTreeChecker:
                  source_tree,
                  build_data_list,
                  build_command_maker,
-                 verbose= False):
+                 verbose= False,
+                 jobs= 1,
+                 link_cache= None):
         """コンストラクタ
         source_tree        : CodeTree
         build_data_list    : BuildDataのリスト
         build_command_maker: BuildCommandMaker
-        verbose            :"""
+        verbose            :
+        jobs               : 同時に実行する試行linkの数
+        link_cache         : LinkCache Noneならばcacheしない"""
         self._source_tree = source_tree
         self._build_data_list = build_data_list
         self._build_command_maker = build_command_maker
         self._verbose = verbose
+        self._jobs = jobs
+        self._link_cache = link_cache
         # build_test時のlog file
         self._analyze_log = subprocess.DEVNULL
     
     def analyze(self):
         if self._verbose:# 表示
             print('SourceTreeChecker analyze')
-        for source in self._source_tree.node_list(depth_sort= True):
-            if self._verbose:# 試行する除外対象を表示
-                print('test removed code: {0}'.format(path_to_string(source)))
-            node = self._source_tree.get(source)
-            if node is None:
-                print('  already removed')
-                continue
+        def make_trial(source):
+            if self._source_tree.get(source) is None:
+                return None
             # 試行用のSourceTreeを作成
-            test_tree = self._source_tree.copy()
-            test_tree.remove(source)
+            #   木を複製せず、取り除かれる部分木のみを求める
+            test_tree = self._source_tree.removal(source)
             # SourceTreeからビルド情報を纏める
             object_list = source_to_object(test_tree.node_list(),
                                            self._build_data_list)
-            build_data  = make_build_test_data(object_list,
-                                               self._build_data_list)
-            # ビルドを試行
-            return_code = build_test(build_data,
-                                    self._build_command_maker,
-                                    self._analyze_log)
-            if self._verbose:# 試行結果表示
+            return make_build_test_data(object_list, self._build_data_list)
+        def report(source, return_code):
+            if self._verbose:# 試行した除外対象を表示
+                print('test removed code: {0}'.format(path_to_string(source)))
+            if return_code is None:
+                print('  already removed')
+            elif self._verbose:# 試行結果表示
                 print('  ReturnCode<{0}>: {1}'.format(
                             return_code,
                             'Success' if return_code == 0 else 'Failed'))
-            if return_code == 0:
-                # 試行に成功したならば除外対象に追加
-                self._source_tree.remove(source)
-                if self._verbose:# 表示
-                    print('  remove: {0}'.format(path_to_string(source)))
+        def commit(source):
+            # 試行に成功したならば除外対象に追加
+            self._source_tree.remove(source)
+            if self._verbose:# 表示
+                print('  remove: {0}'.format(path_to_string(source)))
+        # ビルドを試行
+        with TrialLinkExecutor(self._build_command_maker,
+                               self._jobs,
+                               self._analyze_log,
+                               self._link_cache) as executor:
+            executor.analyze(self._source_tree.node_list(depth_sort= True),
+                             make_trial, commit, report)
         if self._verbose:# 表示
             print()
     
@@ -24,9 +24,10 @@ class SourceTreeMaker:
             self._source_list = get_source_code_list(main_code, code_manager)
         else:
             self._source_list = source_code_list
+        self._source_set   = set(self._source_list)
         self._code_manager = code_manager
         self._verbose      = verbose
-        # 被依存関係データ
+        # 被依存関係データ (CodeManagerが保持する読み取り専用のview)
         self._depended_data = self._code_manager.depended_data_list()
         # CodeTreeに含まれたことのあるcode
         self._detected_code = []
@@ -60,7 +61,7 @@ class SourceTreeMaker:
         depended_source = []
         for node in code_tree.node_list(depth_sort= True):
             for source in (code for code in self._depended_data.get(node, [])
-                           if code in self._source_list):
+                           if code in self._source_set):
                 if not source in depended_source:
                     depended_source.append(source)
         return (node_code, tuple(depended_source))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import concurrent.futures
+from collections import namedtuple
+from ..path_function import path_to_string, path_sort
+
+class ObjectSymbol(namedtuple('ObjectSymbol',
+            ('object_path', 'defined', 'weak_defined', 'undefined'))):
+    """オブジェクトファイルのシンボル
+    object_path : オブジェクトファイルのpath
+    defined     : 定義しているシンボル
+    weak_defined: weakシンボルとして定義しているシンボル
+    undefined   : 参照しているが定義していないシンボル"""
+    def __str__(self):
+        str_piece = []
+        str_piece.append(self.__class__.__name__)
+        str_piece.append('object_path :{0}'.format(
+                    path_to_string(self.object_path)))
+        str_piece.append('defined     :{0}'.format(len(self.defined)))
+        str_piece.append('weak_defined:{0}'.format(len(self.weak_defined)))
+        str_piece.append('undefined   :{0}'.format(len(self.undefined)))
+        return '\n'.join(str_piece)
+
+def read_symbol(object_path, nm= 'nm'):
+    """nmでオブジェクトファイルのシンボルを読み込む
+    object_path: オブジェクトファイルのpath
+    nm         : nmコマンド"""
+    try:
+        output = subprocess.check_output(
+                    [nm, '-P', '-g', str(object_path)],
+                    stderr= subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError) as error:
+        message = 'failed to read symbols of <{0}>: {1}'.format(
+                    path_to_string(object_path), error)
+        raise ValueError(message)
+    return ObjectSymbol(object_path,
+                        *parse_symbol(output.decode('utf-8',
+                                                    'surrogateescape')))
+
+def parse_symbol(text):
+    """nm -P -gの出力を解析
+    W, V, uはweakな定義、w, vは無くてもよい(weakな)参照であり、
+    後者は定義, 未解決のシンボルのいずれにも含めない
+    text: nmの出力
+    return (defined, weak_defined, undefined)
+    
+    >>> parse_symbol('main T 0 10\\nf w\\n_ZTV1B V 0 28\\nputs U\\n')
+    (frozenset({'main'}), frozenset({'_ZTV1B'}), frozenset({'puts'}))"""
+    defined      = set()
+    weak_defined = set()
+    undefined    = set()
+    for line in text.splitlines():
+        # <name> <type> [<value> <size>]
+        piece = line.split()
+        if len(piece) < 2:
+            continue
+        name, symbol_type = piece[0], piece[1]
+        if symbol_type == 'U':
+            undefined.add(name)
+        elif symbol_type in ('w', 'v'):
+            # weakな参照は定義が無くてもリンクできる
+            continue
+        elif symbol_type in ('W', 'V', 'u'):
+            # weakシンボルはinline関数等の重複可能な定義の他、
+            # vtable, typeinfoのように1つのオブジェクトのみが持つ定義がある
+            weak_defined.add(name)
+        else:
+            defined.add(name)
+    return (frozenset(defined),
+            frozenset(weak_defined.difference(defined)),
+            frozenset(undefined.difference(defined, weak_defined)))
+
+class SymbolResolver:
+    """シンボルの定義, 参照関係からリンクに必要なオブジェクトを求める
+    リンクを試行しない"""
+    
+    def __init__(self, nm= 'nm', jobs= 1):
+        """コンストラクタ
+        nm  : nmコマンド
+        jobs: 同時に実行するnmの数"""
+        self._nm = nm
+        self._jobs = max(1, jobs)
+        # 読み込んだシンボル {object_path: ObjectSymbol, ...}
+        self._symbol_data = {}
+    
+    def load(self, object_list):
+        """未読込のオブジェクトファイルのシンボルを読み込む"""
+        target_list = [object_path for object_path in object_list
+                       if not object_path in self._symbol_data]
+        if self._jobs == 1 or len(target_list) < 2:
+            result_list = [read_symbol(object_path, self._nm)
+                           for object_path in target_list]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                        max_workers= self._jobs) as executor:
+                result_list = list(executor.map(
+                            lambda object_path: read_symbol(object_path,
+                                                            self._nm),
+                            target_list))
+        for symbol in result_list:
+            self._symbol_data[symbol.object_path] = symbol
+    
+    def symbol(self, object_path):
+        """オブジェクトファイルのシンボルを返す"""
+        self.load((object_path,))
+        return self._symbol_data[object_path]
+    
+    def resolve(self, main_object, object_list):
+        """main_objectから参照されるシンボルを定義するオブジェクトを
+        新たに参照されるシンボルが無くなるまで追加する
+        main_object: mainとなるオブジェクト
+        object_list: リンク対象となりうるオブジェクト
+        return ((object_path, ...), (unresolved_symbol, ...))
+               unresolved_symbolはライブラリで解決されるべきシンボル"""
+        candidate_list = sorted(set(object_list).difference((main_object,)),
+                                key= path_sort)
+        self.load([main_object] + candidate_list)
+        # シンボルを定義しているオブジェクト 先に見つかったものを優先
+        #   weakシンボルの定義は通常の定義が無い場合のみ用いる
+        definer      = {}
+        weak_definer = {}
+        for object_path in candidate_list:
+            for name in self._symbol_data[object_path].defined:
+                definer.setdefault(name, object_path)
+            for name in self._symbol_data[object_path].weak_defined:
+                weak_definer.setdefault(name, object_path)
+        # 不動点まで必要なオブジェクトを追加
+        needed_set  = {main_object}
+        defined_set = set(self._symbol_data[main_object].defined)
+        defined_set.update(self._symbol_data[main_object].weak_defined)
+        target_list = sorted(self._symbol_data[main_object].undefined)
+        unresolved_set = set()
+        while len(target_list) != 0:
+            name = target_list.pop()
+            if name in defined_set:
+                continue
+            object_path = definer.get(name, weak_definer.get(name))
+            if object_path is None:
+                unresolved_set.add(name)
+                continue
+            needed_set.add(object_path)
+            defined_set.update(self._symbol_data[object_path].defined)
+            defined_set.update(self._symbol_data[object_path].weak_defined)
+            target_list.extend(sorted(
+                        self._symbol_data[object_path].undefined))
+        return (tuple(sorted(needed_set, key= path_sort)),
+                tuple(sorted(unresolved_set)))
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import pathlib
+import subprocess
+import tempfile
+import concurrent.futures
+from .checker_functions import run_link, write_link_log
+
+class TrialLinkExecutor:
+    """試行linkを並列に実行する
+    各試行は固有の一時ファイルへ出力するため、互いに干渉しない
+    with文で使用し、終了時に一時ディレクトリとthread poolを閉じる"""
+    
+    def __init__(self, build_command_maker, jobs= 1,
+                 log_file= subprocess.DEVNULL, link_cache= None):
+        """コンストラクタ
+        build_command_maker: BuildCommandMaker
+        jobs               : 同時に実行する試行数
+        log_file           : 試行のlogを書き込むファイル
+        link_cache         : LinkCache Noneならばcacheしない"""
+        self._build_command_maker = build_command_maker
+        self._jobs = max(1, jobs)
+        self._log_file = log_file
+        self._link_cache = link_cache
+        self._temp_dir = None
+        self._executor = None
+        # 試行の通し番号
+        self._trial_count = 0
+    
+    @property
+    def jobs(self):
+        return self._jobs
+    
+    def __enter__(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        if self._jobs > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers= self._jobs)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._executor is None:
+            self._executor.shutdown()
+            self._executor = None
+        self._temp_dir.cleanup()
+        self._temp_dir = None
+        return False
+    
+    def run(self, build_data_list):
+        """試行linkを実行
+        cacheに結果があるものは実行しない
+        build_data_list: ProgramBuildDataのsequence
+        return ((return_code, command, output), ...) build_data_listと同じ順"""
+        result_list = []
+        # 実行する試行 [(index, fingerprint, command), ...]
+        trial_list = []
+        for build_data in build_data_list:
+            self._trial_count += 1
+            output_path = pathlib.Path(self._temp_dir.name).joinpath(
+                        'trial_{0}.out'.format(self._trial_count))
+            command = self._build_command_maker.link_command(
+                        build_data._replace(program_path= output_path))
+            fingerprint = None
+            if not self._link_cache is None:
+                fingerprint = self._link_cache.fingerprint(
+                            build_data, self._build_command_maker)
+                return_code = self._link_cache.lookup(fingerprint)
+                if not return_code is None:
+                    result_list.append((return_code, command,
+                                        None if return_code == 0
+                                        else 'link result is cached'))
+                    continue
+            trial_list.append((len(result_list), fingerprint, command))
+            result_list.append(None)
+        command_list = [command for _, _, command in trial_list]
+        if self._executor is None or len(command_list) < 2:
+            output_list = [run_link(command) for command in command_list]
+        else:
+            output_list = list(self._executor.map(run_link, command_list))
+        for (index, fingerprint, command), (return_code, output) \
+                in zip(trial_list, output_list):
+            result_list[index] = (return_code, command, output)
+            if not self._link_cache is None:
+                self._link_cache.store(fingerprint, return_code, output)
+        return tuple(result_list)
+    
+    def analyze(self, candidate_list, make_trial, commit, report):
+        """各候補を逐次実行と同じ順に試行し、成功した候補を反映する
+        現在の状態を前提として複数の候補を同時に試行し、
+        成功した候補があればそれ以降の試行結果を破棄してやり直す
+        candidate_list: 候補のsequence
+        make_trial    : 候補を受け取り、現在の状態で試行する
+                        ProgramBuildDataを返す関数 試行不要ならばNone
+        commit        : 試行に成功した候補を反映する関数
+        report        : 候補と試行結果(試行不要ならばNone)を受け取る関数"""
+        position = 0
+        while position < len(candidate_list):
+            # 現在の状態を前提とした試行を作成
+            batch = []
+            trial_count = 0
+            while position < len(candidate_list) and trial_count < self._jobs:
+                candidate = candidate_list[position]
+                build_data = make_trial(candidate)
+                batch.append((position, candidate, build_data))
+                if not build_data is None:
+                    trial_count += 1
+                position += 1
+            result_list = iter(self.run([build_data
+                                         for _, _, build_data in batch
+                                         if not build_data is None]))
+            # 逐次実行と同じ順に結果を反映
+            for index, candidate, build_data in batch:
+                if build_data is None:
+                    report(candidate, None)
+                    continue
+                return_code, command, output = next(result_list)
+                write_link_log(self._log_file, command, output)
+                report(candidate, return_code)
+                if return_code == 0:
+                    commit(candidate)
+                    # 以降の試行は古い状態を前提としているため破棄する
+                    position = index + 1
+                    break
@@ -3,15 +3,21 @@
 import sys
 import pathlib
 
-from .code_manager        import CodeManager
+from .code_manager        import CodeManager, Scanner
 from .compiler_setting    import CompilerSetting
 from .build_command_maker import BuildCommandMaker
 from .object_path_maker \
 import same_source_name, same_source_dir, specific_directory
-from .link_object import LinkObject, LinkObjectMode
+from .link_object import LinkObject, LinkObjectMode, LinkCache
+from .makefile_layout import MakefileLayout
+from .build_backend import BuildBackend
+from .ninja_generator import build_file_name
+from .precompiled_header \
+import PrecompiledHeaderScope, make_precompiled_header
 from .command_line_option import option_parser
 from .main_functions \
-import load_option, make_build_data_list, make_makefile_generator
+import load_option, make_build_data_list, make_makefile_generator, \
+       stale_makefile_list
 from .path_function import path_to_string, path_sort
 
 class MakefileMaker:
@@ -25,6 +31,9 @@ class MakefileMaker:
         self._root_path = pathlib.Path(sys.argv[0]).parent.resolve()
         # コード管理
         self._code_manager = CodeManager(self._option)
+        if not self._option.scan_cache is None:# 依存性解析結果のcache
+            self.scan_cache(self._option.scan_cache,
+                            self._option.scan_cache_hash)
         # オブジェクトファイルのパスを生成する関数
         #   入力 root_path, source_path
         self._object_dir_maker  = same_source_dir()
@@ -35,10 +44,25 @@ class MakefileMaker:
         self._build_command_maker = BuildCommandMaker(
                     self._compiler_setting,
                     self._option.verbose >= 1)
+        if not self._option.scanner is None:# 依存性解析の方法
+            self.scanner(self._option.scanner)
         # LinkObjectMode
         self._link_object_mode = LinkObjectMode.Search
         # LinkObjectのlog file
         self._link_object_log = None
+        # 試行linkの結果のcache
+        self._link_cache = None
+        # LinkObjectの解析結果を保存するファイル
+        self._link_object_result = None
+        # コンパイラが生成する依存関係(.d)を用いるか
+        self._depfile = False
+        # Makefileの構成
+        self._makefile_layout = MakefileLayout.Recursive
+        # 生成するビルドファイルの種類
+        self._build_backend = BuildBackend.Make
+        # プリコンパイル済みヘッダ
+        #   (ヘッダファイル数の上限, PrecompiledHeaderScope) 使用しなければNone
+        self._precompiled_header = None
     
     def run(self):
         # option読み込み
@@ -50,9 +74,14 @@ class MakefileMaker:
                 build_data_list,
                 self._code_manager,
                 self._build_command_maker,
-                self._option.verbose >= 1)
+                self._option.verbose >= 1,
+                self._option.jobs)
         if not self._link_object_log is None:# log file 設定
             link_object_searcher.set_log_file(self._link_object_log)
+        if not self._link_cache is None:# 試行linkの結果のcache設定
+            link_object_searcher.set_link_cache(self._link_cache)
+        if not self._link_object_result is None:# 保存された解析結果を読込
+            link_object_searcher.load(self._link_object_result)
         # LikObjectMode毎に処理
         if self._link_object_mode is LinkObjectMode.All:
             link_object_searcher.all()
@@ -62,13 +91,46 @@ class MakefileMaker:
             link_object_searcher.analyze()
         elif self._link_object_mode is LinkObjectMode.FullAnalyze:
             link_object_searcher.full_analyze()
+        elif self._link_object_mode is LinkObjectMode.Minimize:
+            link_object_searcher.minimize()
+        elif self._link_object_mode is LinkObjectMode.Symbols:
+            link_object_searcher.symbols()
         build_data_list = link_object_searcher.build_data_list()
+        # プリコンパイル済みヘッダ
+        precompiled_header_list = tuple()
+        if not self._precompiled_header is None:
+            precompiled_header_list = make_precompiled_header(
+                        self, build_data_list)
+            self._build_command_maker.set_precompiled_header(
+                        precompiled_header_list)
         # MakefileGeneratorを生成
-        makefile_generators = make_makefile_generator(self, build_data_list)
+        makefile_generators = make_makefile_generator(
+                    self, build_data_list, precompiled_header_list)
+        # cacheはテストモードでも保存する
+        self._code_manager.save_scan_cache()
+        if not self._link_cache is None:# 試行linkの結果のcacheを保存
+            self._link_cache.save()
+            if self._option.verbose >= 1:
+                print(self._link_cache)
         if self._option.test:# テストモードならばファイルを生成せず終了
             return
+        if not self._link_object_result is None:# 解析結果を保存
+            link_object_searcher.save(self._link_object_result)
+        for precompiled_header in precompiled_header_list:# ヘッダファイルを合成
+            precompiled_header.make()
+        for makefile in stale_makefile_list(self, build_data_list):
+            print('unused Makefile: {0}'.format(path_to_string(makefile)))
+        written_count = 0
         for makefile_generator in makefile_generators:
-            makefile_generator.make()
+            if makefile_generator.make():
+                written_count += 1
+        if self._option.verbose >= 1:# 書き込んだビルドファイルの数を表示
+            print('{0}: written<{1}> unchanged<{2}>'.format(
+                        build_file_name
+                        if self._build_backend is BuildBackend.Ninja
+                        else 'Makefile',
+                        written_count,
+                        len(makefile_generators) - written_count))
     
     def source_code(self, source_path):
         """ソースコードを追加"""
@@ -76,8 +138,7 @@ class MakefileMaker:
     
     def source_code_list(self, source_path_list):
         """ソースコードをまとめて追加"""
-        for source_path in source_path_list:
-            self.source_code(source_path)
+        self._code_manager.add_sources(source_path_list)
     
     def main_code(self, program_name, main_code_path):
         # 実行プログラム名と対応するmainコードを追加
@@ -102,6 +163,7 @@ class MakefileMaker:
         self._compiler_setting.compiler = compiler
         # 変更を反映
         self._build_command_maker.update_compiler(self._compiler_setting)
+        self._code_manager.update_compiler()
     
     def compile_option(self, options):
         """コンパイルのオプションを指定"""
@@ -113,15 +175,23 @@ class MakefileMaker:
             self._compiler_setting.option_list.append(options)
         # 変更を反映
         self._build_command_maker.update_compiler(self._compiler_setting)
+        self._code_manager.update_compiler()
     
     def include_path(self, include_path, target_header= None):
         """include設定を読み込む
+        #include "header" の探索にも使用されるため、
+        ソースコードを追加する前に設定する
         include_path (pathlib.Path or str): includeに追加されるpath
         target_header (sequence(str) or str or None)
                     : 対象となるheader名
                       None ならば全てに適用"""
         self._build_command_maker.add_include_setting(
                     include_path, formalize_target_header(target_header))
+        # #include "header" の探索に反映
+        #   相対パスはroot directoryを基準とする
+        self._code_manager.set_include_path(
+                    self._root_path.joinpath(path) for path
+                    in self._build_command_maker.include_path_list())
     
     def library(self, library, target_header= None):
         """library設定を読み込む
@@ -132,13 +202,34 @@ class MakefileMaker:
         self._build_command_maker.add_library_setting(
                     library, formalize_target_header(target_header))
     
+    def scan_cache(self, filename, hash_mode= False):
+        """依存性解析結果のcacheを設定
+        ソースコードを追加する前に設定する
+        filename : cacheを保存するファイル名
+        hash_mode: 内容のhash値でファイルの変更を判定するか"""
+        file_path = self._root_path.joinpath(filename)
+        self._code_manager.set_scan_cache(file_path, hash_mode)
+    
+    def scanner(self, scanner_name):
+        """依存性解析の方法を設定
+        ソースコードを追加する前に設定する
+        scanner_name= regex, compiler"""
+        for scanner in Scanner:
+            if scanner.value == scanner_name:
+                self._code_manager.set_scanner(scanner,
+                                               self._build_command_maker)
+                break
+        else:
+            message= 'scanner_name<{0}> is not Scanner'.format(scanner_name)
+            raise ValueError(message)
+    
     def save_dependence_graph(self, filename):
         file_path = self._root_path.joinpath(filename)
         self._code_manager.save_dependent_graph(file_path)
     
     def link_object_mode(self, mode_name):
         """LinkObjectModeを設定
-        mode_name= search, all, analyze, full-analyze"""
+        mode_name= search, all, analyze, full-analyze, minimize, symbols"""
         for mode in LinkObjectMode:
             if mode.value == mode_name:
                 self._link_object_mode = mode
@@ -152,6 +243,74 @@ class MakefileMaker:
         log_file: log file名 (str or pahlib.Path)"""
         log_path = pathlib.Path(log_file)
         self._link_object_log = log_path
+    
+    def link_object_result(self, filename):
+        """LinkObjectの解析結果を保存するファイルを設定
+        入力が変化していないmain_codeは保存された解析結果を用いる
+        filename: 解析結果を保存するファイル名"""
+        self._link_object_result = self._root_path.joinpath(filename)
+    
+    def link_cache(self, filename, max_size= 10000):
+        """試行linkの結果のcacheを設定
+        filename: cacheを保存するファイル名
+        max_size: 保持する試行結果の上限"""
+        file_path = self._root_path.joinpath(filename)
+        self._link_cache = LinkCache(file_path, max_size)
+    
+    def depfile(self, enable= True):
+        """コンパイラが生成する依存関係(.d)を用いるかを設定
+        Makefileは.dを読み込み、ヘッダファイルの列挙は.dが無い時のみ使用する
+        enable: True or False"""
+        self._depfile = enable
+    
+    def makefile_layout(self, layout_name):
+        """Makefileの構成を設定
+        single, fragmentsではmakeをrootで実行するため、
+        include設定の相対パスは各ディレクトリからrootからのパスに変換される
+        recursiveから変更した場合、各ディレクトリに残ったMakefileは
+        使用されないため、実行時にそれらを表示する
+        layout_name= recursive, single, fragments"""
+        for layout in MakefileLayout:
+            if layout.value == layout_name:
+                self._makefile_layout = layout
+                break
+        else:
+            message= 'layout_name<{0}> is not MakefileLayout'.format(
+                        layout_name)
+            raise ValueError(message)
+    
+    def build_backend(self, backend_name):
+        """生成するビルドファイルの種類を設定
+        ninjaの場合はrootにbuild.ninjaを1つ生成し、
+        Makefileの構成, depfileの設定は用いない
+        backend_name= make, ninja"""
+        for backend in BuildBackend:
+            if backend.value == backend_name:
+                self._build_backend = backend
+                break
+        else:
+            message= 'backend_name<{0}> is not BuildBackend'.format(
+                        backend_name)
+            raise ValueError(message)
+    
+    def precompiled_header(self, count, scope_name= 'project'):
+        """多くのソースコードがincludeするヘッダファイルから
+        プリコンパイル済みヘッダを作成する
+        include guard, もしくは#pragma onceを持つヘッダファイルに限る
+        count     : 1つのプリコンパイル済みヘッダにまとめるヘッダファイルの上限
+                      0以下ならば作成しない
+        scope_name= project, directory"""
+        for scope in PrecompiledHeaderScope:
+            if scope.value == scope_name:
+                break
+        else:
+            message= 'scope_name<{0}> is not PrecompiledHeaderScope'.format(
+                        scope_name)
+            raise ValueError(message)
+        if count <= 0:
+            self._precompiled_header = None
+        else:
+            self._precompiled_header = (count, scope)
 
 def formalize_target_header(target_header):
     """入力された対象headerを整形して返す
@@ -1,7 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import itertools
 from .build_data         import BuildData, ProgramBuildData
 from .makefile_generator import MakefileGenerator
+from .fragment_generator import FragmentGenerator, FragmentRootGenerator
+from .makefile_layout    import MakefileLayout
+from .ninja_generator    import NinjaGenerator
+from .build_backend      import BuildBackend
 from .object_path_maker  import object_path_maker
 from .path_function      import path_sort
 
@@ -13,6 +18,25 @@ def load_option(self):
     # logfile
     if not self._option.log_file is None:
         self.set_link_object_log(self._option.log_file)
+    # 解析結果の保存
+    if not self._option.link_result is None:
+        self.link_object_result(self._option.link_result)
+    # 試行linkの結果のcache
+    if not self._option.link_cache is None:
+        self.link_cache(self._option.link_cache, self._option.link_cache_size)
+    # ビルドファイルの種類
+    if not self._option.build_backend is None:
+        self.build_backend(self._option.build_backend)
+    # Makefileの構成
+    if not self._option.makefile_layout is None:
+        self.makefile_layout(self._option.makefile_layout)
+    # コンパイラが生成する依存関係
+    if self._option.depfile:
+        self.depfile(True)
+    # プリコンパイル済みヘッダ
+    if not self._option.precompiled_header is None:
+        self.precompiled_header(self._option.precompiled_header,
+                                self._option.precompiled_header_scope)
 
 def make_build_data_list(self):
     """各ソースコードのビルド情報をまとめる
@@ -30,33 +54,126 @@ def make_build_data_list(self):
                     dependence_data[source_path].include_libs)
     return build_data_list
 
-def make_makefile_generator(self, build_data_list):
-    """各ディレクトリ毎にMakefileGeneratorを生成"""
-    # ディレクトリ設定
-    dir_list = sorted(set(source.parent for source in build_data_list.keys()),
+def make_makefile_generator(self, build_data_list, precompiled_header_list):
+    """ビルドファイルの種類, Makefileの構成に合わせてGeneratorを生成
+    precompiled_header_list: (PrecompiledHeader, ...)"""
+    # ディレクトリ毎に振り分ける
+    dir_build_data = group_build_data(build_data_list)
+    if self._build_backend is BuildBackend.Ninja:
+        return [NinjaGenerator(self._root_path,
+                               concat_build_data(dir_build_data),
+                               self._build_command_maker,
+                               precompiled_header_list)]
+    if self._makefile_layout is MakefileLayout.Single:
+        return single_makefile_generator(
+                    self, dir_build_data, precompiled_header_list)
+    elif self._makefile_layout is MakefileLayout.Fragments:
+        return fragment_makefile_generator(
+                    self, dir_build_data, precompiled_header_list)
+    return recursive_makefile_generator(
+                self, dir_build_data, precompiled_header_list)
+
+def stale_makefile_list(self, build_data_list):
+    """Makefileの構成がRecursive以外の場合に使用されない、
+    root以外のソースコードのディレクトリに存在するMakefile
+    Recursiveで生成されたものが残っている可能性がある
+    return (makefile_path, ...)"""
+    if self._makefile_layout is MakefileLayout.Recursive:
+        return tuple()
+    dir_list = sorted(set(source_path.parent
+                          for source_path in build_data_list.keys()),
                       key= path_sort)
-    sub_dir_list = dir_list.copy()
-    if self._root_path in dir_list:
-        sub_dir_list.remove(self._root_path)
-    else:
+    return tuple(dir.joinpath('Makefile') for dir in dir_list
+                 if dir != self._root_path
+                    and dir.joinpath('Makefile').is_file())
+
+def recursive_makefile_generator(self, dir_build_data,
+                                 precompiled_header_list):
+    """各ディレクトリ毎にMakefileGeneratorを生成
+    プリコンパイル済みヘッダは合成したヘッダファイルのディレクトリで作成する
+    dir_build_data         : {dir_path: (BuildData, ...), ...}
+    precompiled_header_list: (PrecompiledHeader, ...)"""
+    # ディレクトリ設定
+    dir_list = sorted(dir_build_data.keys(), key= path_sort)
+    sub_dir_list = tuple(dir for dir in dir_list if dir != self._root_path)
+    if not self._root_path in dir_build_data:
         dir_list.append(self._root_path)
+    # プリコンパイル済みヘッダをディレクトリ毎に振り分ける
+    dir_precompiled_header = {}
+    for precompiled_header in precompiled_header_list:
+        dir_precompiled_header.setdefault(
+                    precompiled_header.header_path.parent,
+                    []).append(precompiled_header)
     # MakefileGeneratorを生成
     generator_list = []
     for dir in dir_list:
-        dir_build_data_list = tuple(sorted((build_data_list[source]
-                    for source in build_data_list.keys()
-                    if source.parent == dir),
-                    key= lambda build_data: path_sort(build_data.source_path)))
+        dir_build_data_list = dir_build_data.get(dir, tuple())
+        dir_precompiled_header_list = tuple(
+                    dir_precompiled_header.get(dir, tuple()))
         # rootディレクトリとそれ以外で分岐
         if dir == self._root_path:
             generator_list.append(MakefileGenerator(
                     dir,
                     dir_build_data_list,
                     self._build_command_maker,
-                    sub_dir_list))
+                    sub_dir_list,
+                    depfile= self._depfile,
+                    precompiled_header_list= dir_precompiled_header_list))
         else:
             generator_list.append(MakefileGenerator(
                     dir,
                     dir_build_data_list,
-                    self._build_command_maker))
+                    self._build_command_maker,
+                    depfile= self._depfile,
+                    precompiled_header_list= dir_precompiled_header_list))
     return generator_list
+
+def single_makefile_generator(self, dir_build_data, precompiled_header_list):
+    """全てのルールを含むrootのMakefileGeneratorを生成
+    dir_build_data         : {dir_path: (BuildData, ...), ...}
+    precompiled_header_list: (PrecompiledHeader, ...)"""
+    return [MakefileGenerator(self._root_path,
+                              concat_build_data(dir_build_data),
+                              self._build_command_maker,
+                              depfile= self._depfile,
+                              precompiled_header_list= precompiled_header_list)]
+
+def fragment_makefile_generator(self, dir_build_data, precompiled_header_list):
+    """各ディレクトリ毎の断片と、それらをincludeするrootのMakefileの
+    Generatorを生成
+    プリコンパイル済みヘッダのルールはrootのMakefileに置く
+    dir_build_data         : {dir_path: (BuildData, ...), ...}
+    precompiled_header_list: (PrecompiledHeader, ...)"""
+    generator_list = [
+                FragmentGenerator(dir,
+                                  dir_build_data[dir],
+                                  self._build_command_maker,
+                                  self._root_path,
+                                  depfile= self._depfile)
+                for dir in sorted(dir_build_data.keys(), key= path_sort)]
+    generator_list.insert(0, FragmentRootGenerator(
+                self._root_path,
+                tuple(generator.fragment_path()
+                      for generator in generator_list),
+                depfile= self._depfile,
+                build_command_maker= self._build_command_maker,
+                precompiled_header_list= precompiled_header_list))
+    return generator_list
+
+def concat_build_data(dir_build_data):
+    """ディレクトリ毎に振り分けたビルド情報をディレクトリ順に結合する
+    dir_build_data: {dir_path: (BuildData, ...), ...}"""
+    return tuple(build_data
+                 for dir in sorted(dir_build_data.keys(), key= path_sort)
+                 for build_data in dir_build_data[dir])
+
+def group_build_data(build_data_list):
+    """ビルド情報をソースコードのディレクトリ毎に振り分ける
+    全体を一度だけsortし、ディレクトリ毎に連続する区間に分割する
+    build_data_list: {source_path: BuildData, ...}
+    return {dir_path: (BuildData, ...), ...} 各区間はpath_sort順"""
+    source_list = sorted(build_data_list.keys(), key= path_sort)
+    return dict((dir, tuple(build_data_list[source] for source in source_group))
+                for dir, source_group in itertools.groupby(
+                            source_list,
+                            key= lambda source: source.parent))
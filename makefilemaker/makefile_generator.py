@@ -1,28 +1,43 @@
 # -*- coding: utf-8 -*-
+import itertools
 from .build_data    import BuildData, ProgramBuildData
 from .path_function import relative_to, path_to_string, path_sort
+from .file_writer   import write_lines_if_changed
 
 class MakefileMacroName:
     programs = 'PROGRAMS'
     objects  = 'OBJECTS'
     subdirs  = 'SUBDIRS'
+    depends  = 'DEPENDS'
 
 class MakefileGenerator:
     """"""
+    # マクロ宣言の演算子
+    macro_operator = '='
+    
     def __init__(self,
                  dir_path,
                  build_data_list,
                  build_comamnd_maker,
-                 subdir_list= tuple()):
+                 subdir_list= tuple(),
+                 depfile= False,
+                 precompiled_header_list= tuple()):
         """コンストラクタ
         dir_path           : Makefileを生成するディレクトリ
         build_data_list    : ビルド情報
         build_command_maker: BuildCommandMaker
-        subdir_list        : 派生するdirectory"""
+        subdir_list        : 派生するdirectory
+        depfile            : コンパイラが生成する依存関係(.d)を用いるか
+                               Trueならばheaderの列挙は.dが無い時のみ使用
+        precompiled_header_list
+                           : このMakefileで作成するプリコンパイル済みヘッダ
+                               subdirはこれらの作成後にmakeされる"""
         self._dir_path = dir_path
         self._build_data_list = build_data_list
         self._build_comamnd_maker = build_comamnd_maker
         self._subdir_list = subdir_list
+        self._depfile = depfile
+        self._precompiled_header_list = precompiled_header_list
     
     def exists_program(self):
         """ビルド情報にプログラム作成情報が含まれているか判定"""
@@ -35,62 +50,74 @@ class MakefileGenerator:
                      if isinstance(build_data, ProgramBuildData))
     
     def make(self):
+        """Makefileを生成
+        生成したコードは逐次書き込まれ、内容が変化していなければ置き換えない
+        return 書き込んだならばTrue"""
         makefile = self._dir_path.joinpath('Makefile')
-        with makefile.open(mode= 'w', encoding= 'utf-8', newline= '') as file:
-            file.write('\n'.join(self.make_code()))
+        return write_lines_if_changed(makefile, self.make_code())
     
     def make_code(self):
-        """Makefileのコードを生成"""
-        code = []
+        """Makefileのコードを1行ずつ生成"""
         # MACRO宣言
-        code.extend(self.macro_programs())
-        code.extend(self.macro_objects())
-        code.extend(self.macro_subdirs())
+        yield from self.macro_programs()
+        yield from self.macro_objects()
+        yield from self.macro_subdirs()
+        yield from self.macro_depends()
         # all
-        code.extend(self.target_all())
+        yield from self.target_all()
         # clean
-        code.extend(self.target_clean())
+        yield from self.target_clean()
         # link
-        code.extend(self.link_rule())
+        yield from self.link_rule()
         # compile
-        code.extend(self.compile_rule())
+        yield from self.compile_rule()
+        # プリコンパイル済みヘッダ
+        yield from self.precompile_rule()
         # header依存
-        code.extend(self.dependent_header())
-        return code
+        yield from self.dependent_header()
+        yield from self.precompiled_header_dependence()
+        # コンパイラが生成した依存関係
+        yield from self.include_depends()
     
     def macro_programs(self):
         """実行プログラムのマクロ(PROGRAMS)を宣言"""
-        code = []
-        program_path_list = sorted(
-                    (build_data.program_path
-                     for build_data in self.program_build_data_list()),
-                    key= path_sort)
         if self.exists_program():
-            code.extend(macro_format(
+            program_path_list = sorted(
+                        (build_data.program_path
+                         for build_data in self.program_build_data_list()),
+                        key= path_sort)
+            yield from macro_format(
                     MakefileMacroName.programs,
-                    [path_to_string(program_path, self._dir_path)
-                     for program_path in program_path_list]))
-        return code
+                    (path_to_string(program_path, self._dir_path)
+                     for program_path in program_path_list),
+                    self.macro_operator)
     
     def macro_objects(self):
         """全オブジェクトのマクロ(OBJECTS)を宣言"""
-        code = []
         if len(self._build_data_list) != 0:
-            code.extend(macro_format(
+            yield from macro_format(
                     MakefileMacroName.objects,
-                    [path_to_string(build_data.object_path, self._dir_path)
-                     for build_data in self._build_data_list]))
-        return code
+                    (path_to_string(build_data.object_path, self._dir_path)
+                     for build_data in self._build_data_list),
+                    self.macro_operator)
     
     def macro_subdirs(self):
         """サブディレクトリのマクロ(SUBDIRS)を宣言"""
-        code = []
         if len(self._subdir_list) != 0:
-            code.extend(macro_format(
+            yield from macro_format(
                     MakefileMacroName.subdirs,
-                    [path_to_string(subdir, self._dir_path)
-                     for subdir in self._subdir_list]))
-        return code
+                    (path_to_string(subdir, self._dir_path)
+                     for subdir in self._subdir_list),
+                    self.macro_operator)
+    
+    def macro_depends(self):
+        """依存関係ファイルのマクロ(DEPENDS)を宣言"""
+        if self._depfile and len(self._build_data_list) != 0:
+            yield from macro_format(
+                    MakefileMacroName.depends,
+                    (path_to_string(depend_path(build_data), self._dir_path)
+                     for build_data in self._build_data_list),
+                    self.macro_operator)
     
     def target_all(self):
         """allを生成"""
@@ -103,19 +130,22 @@ class MakefileGenerator:
         if self.exists_program():
             target.append('$({0})'.format(MakefileMacroName.programs))
         # code生成
-        code = []
-        code.append('.PHONY: all')
-        code.extend(target_format('all', [' '.join(target)]))
+        yield '.PHONY: all'
+        yield from target_format('all', [' '.join(target)])
         # subdirs用のcode
         if len(self._subdir_list) != 0:
             dummy_target = 'MAKE_SUBDIR'
-            code.extend(target_format(
+            #   プリコンパイル済みヘッダを先に作成する
+            yield from target_format(
                     '$({0})'.format(MakefileMacroName.subdirs),
-                    [dummy_target]))
-            code.append('\t$(MAKE) all -C $@')
-            code.extend(target_format(dummy_target))
-        code.append('')# 空行
-        return code
+                    [dummy_target]
+                    + [path_to_string(precompiled_header.gch_path,
+                                      self._dir_path)
+                       for precompiled_header
+                       in self._precompiled_header_list])
+            yield '\t$(MAKE) all -C $@'
+            yield from target_format(dummy_target)
+        yield ''# 空行
     
     def target_clean(self):
         """cleanを生成"""
@@ -124,52 +154,99 @@ class MakefileGenerator:
             rm_target.append('$({0})'.format(MakefileMacroName.objects))
         if self.exists_program():
             rm_target.append('$({0})'.format(MakefileMacroName.programs))
+        if self._depfile and len(self._build_data_list) != 0:
+            rm_target.append('$({0})'.format(MakefileMacroName.depends))
+        rm_target.extend(path_to_string(precompiled_header.gch_path,
+                                        self._dir_path)
+                         for precompiled_header
+                         in self._precompiled_header_list)
         # コード生成
-        code = []
-        code.append('.PHONY: clean')
-        code.extend(target_format('clean'))
+        yield '.PHONY: clean'
+        yield from target_format('clean')
         if len(self._subdir_list) == 0:
-            code.append('\trm -f {0}'.format(' '.join(rm_target)))
+            yield '\trm -f {0}'.format(' '.join(rm_target))
         else:
-            code.append('\trm -f {0}; \\'.format(' '.join(rm_target)))
-            code.extend(['\tfor subdir in $({0}); do \\'
-                                 .format(MakefileMacroName.subdirs),
-                         '\t    $(MAKE) clean -C $$subdir; \\',
-                         '\tdone'])
-        code.append('')# 空行
-        return code
+            yield '\trm -f {0}; \\'.format(' '.join(rm_target))
+            yield '\tfor subdir in $({0}); do \\'.format(
+                        MakefileMacroName.subdirs)
+            yield '\t    $(MAKE) clean -C $$subdir; \\'
+            yield '\tdone'
+        yield ''# 空行
     
     def compile_rule(self):
         """各ソースコードのルールを生成"""
-        code = []
         for build_data in self._build_data_list:
-            code.extend(compile_rule(build_data,
-                                     self._build_comamnd_maker,
-                                     self._dir_path))
-            code.append('')
-        return code
+            yield from compile_rule(build_data,
+                                    self._build_comamnd_maker,
+                                    self._dir_path,
+                                    self._depfile)
+            yield ''
+    
+    def precompile_rule(self):
+        """プリコンパイル済みヘッダのルールを生成
+        他のディレクトリで作成するものは、そのディレクトリでmakeする"""
+        for precompiled_header in self._precompiled_header_list:
+            yield from precompile_rule(precompiled_header,
+                                       self._build_comamnd_maker,
+                                       self._dir_path)
+            yield ''
+        for precompiled_header in self.external_precompiled_header_list():
+            yield from delegate_precompile_rule(precompiled_header,
+                                                self._dir_path)
+            yield ''
+    
+    def external_precompiled_header_list(self):
+        """このディレクトリのオブジェクトが使用し、
+        他のディレクトリのMakefileで作成するプリコンパイル済みヘッダ"""
+        result = []
+        for build_data in self._build_data_list:
+            precompiled_header = self._build_comamnd_maker.precompiled_header(
+                        build_data)
+            if (not precompiled_header is None
+                and not precompiled_header in self._precompiled_header_list
+                and not precompiled_header in result):
+                result.append(precompiled_header)
+        return result
     
     def link_rule(self):
         """各プログラムのリンクのルールを生成"""
-        code = []
         # Program名でsortする
         build_data_list = sorted(
                     self.program_build_data_list(),
                     key= lambda build_data: path_sort(build_data.program_path))
         for build_data in build_data_list:
-            code.extend(link_rule(build_data,
-                                  self._build_comamnd_maker,
-                                  self._dir_path))
-            code.append('')
-        return code
+            yield from link_rule(build_data,
+                                 self._build_comamnd_maker,
+                                 self._dir_path)
+            yield ''
     
     def dependent_header(self):
-        """各ソースコードの依存ヘッダファイルを列挙"""
+        """各ソースコードの依存ヘッダファイルを列挙
+        depfileならば.dが存在しない時のみ有効とする"""
+        for build_data in self._build_data_list:
+            if self._depfile:
+                yield from fallback_dependent_header(build_data,
+                                                     self._dir_path)
+            else:
+                yield from dependent_header(build_data, self._dir_path)
+            yield ''
+    
+    def precompiled_header_dependence(self):
+        """プリコンパイル済みヘッダを使用するオブジェクトを
+        その作成後にコンパイルする"""
         code = []
         for build_data in self._build_data_list:
-            code.extend(dependent_header(build_data, self._dir_path))
-            code.append('')
-        return code
+            code.extend(precompiled_header_dependence(
+                        build_data, self._build_comamnd_maker, self._dir_path))
+        if len(code) != 0:
+            yield from code
+            yield ''
+    
+    def include_depends(self):
+        """コンパイラが生成した依存関係ファイルを読み込む"""
+        if self._depfile and len(self._build_data_list) != 0:
+            yield '-include $({0})'.format(MakefileMacroName.depends)
+            yield ''
     
     def __repr__(self):
         return '{0}({1})'.format(
@@ -177,72 +254,133 @@ class MakefileGenerator:
                    ', '.join('{0}= {1}'.format(key, getattr(self, key))
                              for key in sorted(self.__dict__.keys())))
 
-def macro_format(macro_name, value_list):
+def macro_format(macro_name, value_list, operator= '='):
     """MakefileのMACRO宣言のformat
     macro_name: マクロ名
-    value_list: マクロの値"""
-    code = []
-    if len(value_list) != 0:# 値が存在しない時は宣言しない
-        code.append('{0} = \\'.format(macro_name))
-        code.extend('  {0} \\'.format(value) for value in value_list[:-1])
-        code.append('  {0}'.format(value_list[-1]))
-        code.append('')# 末尾に空行
-    return code
+    value_list: マクロの値 (iterable)
+    operator  : 宣言の演算子 '=' or '+='"""
+    value_iter = iter(value_list)
+    previous = next(value_iter, _no_value)
+    if previous is _no_value:# 値が存在しない時は宣言しない
+        return
+    yield '{0} {1} \\'.format(macro_name, operator)
+    for value in value_iter:
+        yield '  {0} \\'.format(previous)
+        previous = value
+    yield '  {0}'.format(previous)
+    yield ''# 末尾に空行
 
-def target_format(target, depending_list= [], multiline= False):
+def target_format(target, depending_list= (), multiline= False):
     """Makefileのtarget宣言のformat
     target        : target名
-    depending_list: targetが依存しているもの
+    depending_list: targetが依存しているもの (iterable)
     multiline     : depending_listが1つでも複数行に分割するか
                       Default False"""
-    code = []
+    depending_iter = iter(depending_list)
+    first  = next(depending_iter, _no_value)
+    second = next(depending_iter, _no_value)
     # depending_listの値数によって分岐
-    if len(depending_list) == 0:
-        code.append('{0}:'.format(target))
-    elif len(depending_list) == 1 and not multiline:
-        code.append('{0}: {1}'.format(target, depending_list[0]))
+    if first is _no_value:
+        yield '{0}:'.format(target)
+    elif second is _no_value and not multiline:
+        yield '{0}: {1}'.format(target, first)
     else:
-        code.append('{0}: \\'.format(target))
-        code.extend('  {0} \\'.format(depending)
-                    for depending in depending_list[:-1])
-        code.append('  {0}'.format(depending_list[-1]))
-    return code
+        yield '{0}: \\'.format(target)
+        if not second is _no_value:
+            depending_iter = itertools.chain((second,), depending_iter)
+        previous = first
+        for depending in depending_iter:
+            yield '  {0} \\'.format(previous)
+            previous = depending
+        yield '  {0}'.format(previous)
 
-def compile_rule(build_data, build_command_maker, dir_path):
-    """ルールを作成"""
-    code = []
+def compile_rule(build_data, build_command_maker, dir_path, depfile= False):
+    """ルールを作成
+    depfile: コンパイル時に依存関係ファイル(.d)を生成するか"""
     # object : source_code
-    code.append('{0}: {1}'.format(
+    yield '{0}: {1}'.format(
             path_to_string(build_data.object_path, dir_path),
-            path_to_string(build_data.source_path, dir_path)))
+            path_to_string(build_data.source_path, dir_path))
     # compile command
-    code.append('\t{0}'.format(build_command_maker
-                .compile_command_makefile_macro(build_data, dir_path)))
-    return code
-
+    command = build_command_maker.compile_command_makefile_macro(
+                build_data, dir_path)
+    if depfile:
+        command = '{0} {1}'.format(command, depfile_option)
+    yield '\t{0}'.format(command)
 
 def link_rule(build_data, build_command_maker, dir_path):
     """オブジェクトリンクのルールを作成"""
-    code = []
     # プログラム名
-    code.extend(target_format(
-                path_to_string(build_data.program_path, dir_path),
-                [(path_to_string(object, dir_path))
-                for object in build_data.link_objects]))
+    yield from target_format(
+            path_to_string(build_data.program_path, dir_path),
+            (path_to_string(object, dir_path)
+             for object in build_data.link_objects))
     # link command
-    code.append('\t{0}'.format(build_command_maker
-                .link_command_makefile_macro(build_data, dir_path)))
-    return code
+    yield '\t{0}'.format(build_command_maker
+            .link_command_makefile_macro(build_data, dir_path))
 
 def dependent_header(build_data, dir_path):
     """オブジェクトとヘッダファイルの依存関係を表わすコード"""
-    code = []
     header_list = sorted((relative_to(header, dir_path)
                           for header in build_data.include_files),
                          key= path_sort)
     if len(header_list) != 0:
-        code.extend(target_format(
+        yield from target_format(
+                path_to_string(build_data.object_path, dir_path),
+                (header.as_posix() for header in header_list),
+                multiline= True)
+
+def precompile_rule(precompiled_header, build_command_maker, dir_path):
+    """プリコンパイル済みヘッダのルールを作成"""
+    yield from target_format(
+            path_to_string(precompiled_header.gch_path, dir_path),
+            itertools.chain(
+                    (path_to_string(precompiled_header.header_path,
+                                    dir_path),),
+                    (path_to_string(file, dir_path)
+                     for file in precompiled_header.depend_files)))
+    yield '\t{0}'.format(build_command_maker
+            .precompile_command_makefile_macro(precompiled_header, dir_path))
+
+def delegate_precompile_rule(precompiled_header, dir_path):
+    """他のディレクトリで作成するプリコンパイル済みヘッダのルールを作成
+    依存ファイルが更新されていれば、作成するディレクトリでmakeする"""
+    yield from target_format(
+            path_to_string(precompiled_header.gch_path, dir_path),
+            itertools.chain(
+                    (path_to_string(precompiled_header.header_path,
+                                    dir_path),),
+                    (path_to_string(file, dir_path)
+                     for file in precompiled_header.depend_files)))
+    yield '\t$(MAKE) -C {0} {1}'.format(
+            path_to_string(precompiled_header.header_path.parent, dir_path),
+            precompiled_header.gch_path.name)
+
+def precompiled_header_dependence(build_data, build_command_maker, dir_path):
+    """オブジェクトとプリコンパイル済みヘッダの依存関係を表わすコード"""
+    precompiled_header = build_command_maker.precompiled_header(build_data)
+    if not precompiled_header is None:
+        yield '{0}: {1}'.format(
                 path_to_string(build_data.object_path, dir_path),
-                [header.as_posix() for header in header_list],
-                multiline= True))
-    return code
+                path_to_string(precompiled_header.gch_path, dir_path))
+
+def fallback_dependent_header(build_data, dir_path):
+    """依存関係ファイル(.d)が生成されるまでの代替となる依存関係"""
+    header_code = list(dependent_header(build_data, dir_path))
+    if len(header_code) != 0:
+        yield 'ifeq (,$(wildcard {0}))'.format(
+                path_to_string(depend_path(build_data), dir_path))
+        yield from header_code
+        yield 'endif'
+
+def depend_path(build_data):
+    """コンパイラが生成する依存関係ファイル(.d)のpath
+    -MMDはオブジェクトファイルの拡張子を.dに置き換えたファイルに出力する"""
+    return build_data.object_path.with_suffix('.d')
+
+# 依存関係ファイル(.d)を生成するコンパイルオプション
+#   -MP: ヘッダファイルが削除されてもmakeが失敗しないようにする
+depfile_option = '-MMD -MP'
+
+# 値が存在しないことを表す
+_no_value = object()
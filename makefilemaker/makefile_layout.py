@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+import enum
+
+class MakefileLayout(enum.Enum):
+    """Makefileの構成
+    Recursive: ディレクトリ毎にMakefileを生成し、rootから$(MAKE) -Cで呼ぶ
+    Single   : rootに全てのルールを含む1つのMakefileを生成する
+    Fragments: ディレクトリ毎のルールを断片(Makefile.mk)とし、
+               rootのMakefileからincludeする
+    Single, Fragmentsではmakeはrootで実行されるため、
+    include設定の相対パスは各ディレクトリからrootからのパスに変換される
+    また、Recursiveで生成した各ディレクトリのMakefileは削除されずに残る"""
+    Recursive = 'recursive'
+    Single    = 'single'
+    Fragments = 'fragments'
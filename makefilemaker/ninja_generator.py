@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import itertools
+from .build_data    import ProgramBuildData
+from .path_function import path_to_string, path_sort
+from .file_writer   import write_lines_if_changed
+
+# 生成するファイル名
+build_file_name = 'build.ninja'
+
+class NinjaGenerator:
+    """build.ninjaを生成する
+    ninjaはrootで実行されるため、pathはrootを基準とする
+    commandの基本部分が同じビルドは1つのruleを共有する"""
+    def __init__(self,
+                 dir_path,
+                 build_data_list,
+                 build_comamnd_maker,
+                 precompiled_header_list= tuple()):
+        """コンストラクタ
+        dir_path           : build.ninjaを生成するディレクトリ
+        build_data_list    : ビルド情報
+        build_command_maker: BuildCommandMaker
+        precompiled_header_list
+                           : 作成するプリコンパイル済みヘッダ"""
+        self._dir_path = dir_path
+        self._build_data_list = build_data_list
+        self._build_comamnd_maker = build_comamnd_maker
+        self._precompiled_header_list = precompiled_header_list
+        # ruleの名前
+        #   {(command_type, command_base): rule_name, ...}
+        self._rule_name = {}
+        # command_type毎のrule数
+        self._rule_count = {}
+    
+    def program_build_data_list(self):
+        """ビルド情報の中からプログラム作成情報を抽出
+        プログラム名でsortする"""
+        return tuple(sorted(
+                    (build_data for build_data in self._build_data_list
+                     if isinstance(build_data, ProgramBuildData)),
+                    key= lambda build_data: path_sort(build_data.program_path)))
+    
+    def make(self):
+        """build.ninjaを生成
+        生成したコードは逐次書き込まれ、内容が変化していなければ置き換えない
+        return 書き込んだならばTrue"""
+        build_file = self._dir_path.joinpath(build_file_name)
+        return write_lines_if_changed(build_file, self.make_code())
+    
+    def make_code(self):
+        """build.ninjaのコードを1行ずつ生成"""
+        # deps = gcc を使用するのに必要なversion
+        yield 'ninja_required_version = 1.3'
+        yield ''
+        # rule
+        yield from self.compile_rule()
+        yield from self.link_rule()
+        # build
+        yield from self.precompile_build()
+        yield from self.compile_build()
+        yield from self.link_build()
+        # all
+        yield from self.target_all()
+    
+    def rule_name(self, command_type, command_base):
+        """commandの基本部分に対応するrule名"""
+        key = (command_type, command_base)
+        if not key in self._rule_name:
+            count = self._rule_count.get(command_type, 0)
+            self._rule_name[key] = '{0}_{1}'.format(command_type, count)
+            self._rule_count[command_type] = count + 1
+        return self._rule_name[key]
+    
+    def compile_template(self, build_data):
+        """コンパイルのcommandの基本部分"""
+        return self._build_comamnd_maker.compile_template(
+                    build_data.include_libs,
+                    build_data.source_path.parent,
+                    self._dir_path)
+    
+    def precompile_template(self, precompiled_header):
+        """プリコンパイル済みヘッダを作成するcommandの基本部分"""
+        return self._build_comamnd_maker.compile_template(
+                    precompiled_header.include_libs,
+                    precompiled_header.header_path.parent,
+                    self._dir_path)
+    
+    def link_template(self, build_data):
+        """リンクのcommandの基本部分"""
+        return self._build_comamnd_maker.link_template(
+                    build_data.include_libs)
+    
+    def compile_rule(self):
+        """コンパイルのruleを生成
+        コンパイラが生成する依存関係をninjaが読み込む(deps = gcc)
+        プリコンパイル済みヘッダを作成する場合は、
+        その使用オプションをbuild毎の変数pchで与える"""
+        template_list = unique(itertools.chain(
+                    (self.compile_template(build_data)
+                     for build_data in self._build_data_list),
+                    (self.precompile_template(precompiled_header)
+                     for precompiled_header in self._precompiled_header_list)))
+        option = ' -MMD -MF $out.d'
+        if len(self._precompiled_header_list) != 0:
+            option = ' $pch' + option
+        for template in template_list:
+            yield 'rule {0}'.format(self.rule_name('compile', template))
+            yield '  command = {0}{1}'.format(
+                        escape_command(template).format(output= '$out',
+                                                        code= '$in'),
+                        option)
+            yield '  depfile = $out.d'
+            yield '  deps = gcc'
+            yield '  description = compile $in'
+            yield ''
+    
+    def link_rule(self):
+        """リンクのruleを生成"""
+        template_list = unique(self.link_template(build_data)
+                               for build_data
+                               in self.program_build_data_list())
+        for template in template_list:
+            yield 'rule {0}'.format(self.rule_name('link', template))
+            yield '  command = {0}'.format(
+                        escape_command(template).format(output= '$out',
+                                                        target= '$in'))
+            yield '  description = link $out'
+            yield ''
+    
+    def precompile_build(self):
+        """各プリコンパイル済みヘッダの作成を生成"""
+        for precompiled_header in self._precompiled_header_list:
+            yield 'build {0}: {1} {2}'.format(
+                        escape_path(path_to_string(precompiled_header.gch_path,
+                                                   self._dir_path)),
+                        self.rule_name(
+                                'compile',
+                                self.precompile_template(precompiled_header)),
+                        escape_path(path_to_string(
+                                    precompiled_header.header_path,
+                                    self._dir_path)))
+        if len(self._precompiled_header_list) != 0:
+            yield ''
+    
+    def compile_build(self):
+        """各ソースコードのコンパイルを生成
+        プリコンパイル済みヘッダを使用する場合は、その作成後にコンパイルする"""
+        for build_data in self._build_data_list:
+            precompiled_header = self._build_comamnd_maker.precompiled_header(
+                        build_data)
+            implicit = ''
+            if not precompiled_header is None:
+                implicit = ' | {0}'.format(escape_path(path_to_string(
+                            precompiled_header.gch_path, self._dir_path)))
+            yield 'build {0}: {1} {2}{3}'.format(
+                        escape_path(path_to_string(build_data.object_path,
+                                                   self._dir_path)),
+                        self.rule_name('compile',
+                                       self.compile_template(build_data)),
+                        escape_path(path_to_string(build_data.source_path,
+                                                   self._dir_path)),
+                        implicit)
+            if not precompiled_header is None:
+                yield '  pch = {0}'.format(escape_command(
+                            self._build_comamnd_maker.precompiled_header_option(
+                                        build_data, self._dir_path)))
+        if len(self._build_data_list) != 0:
+            yield ''
+    
+    def link_build(self):
+        """各プログラムのリンクを生成"""
+        for build_data in self.program_build_data_list():
+            yield from build_format(
+                        escape_path(path_to_string(build_data.program_path,
+                                                   self._dir_path)),
+                        self.rule_name('link',
+                                       self.link_template(build_data)),
+                        (escape_path(path_to_string(object, self._dir_path))
+                         for object in build_data.link_objects))
+            yield ''
+    
+    def target_all(self):
+        """allを生成し、defaultとする"""
+        target_list = [escape_path(path_to_string(build_data.object_path,
+                                                  self._dir_path))
+                       for build_data in self._build_data_list]
+        target_list.extend(
+                    escape_path(path_to_string(build_data.program_path,
+                                               self._dir_path))
+                    for build_data in self.program_build_data_list())
+        yield from build_format('all', 'phony', target_list)
+        yield 'default all'
+        yield ''
+    
+    def __repr__(self):
+        return '{0}({1})'.format(
+                   self.__class__.__name__,
+                   ', '.join('{0}= {1}'.format(key, getattr(self, key))
+                             for key in sorted(self.__dict__.keys())))
+
+def build_format(output, rule, input_list):
+    """ninjaのbuild宣言のformat
+    入力は1行に1つずつ並べる
+    output    : 出力
+    rule      : rule名
+    input_list: 入力 (iterable)"""
+    input_list = list(input_list)
+    if len(input_list) == 0:
+        yield 'build {0}: {1}'.format(output, rule)
+        return
+    yield 'build {0}: {1} $'.format(output, rule)
+    for input in input_list[:-1]:
+        yield '    {0} $'.format(input)
+    yield '    {0}'.format(input_list[-1])
+
+def unique(value_list):
+    """重複を除き、最初に現れた順に並べる"""
+    result = []
+    value_set = set()
+    for value in value_list:
+        if not value in value_set:
+            result.append(value)
+            value_set.add(value)
+    return result
+
+def escape_path(path):
+    """ninjaのbuild宣言で用いるpathのescape"""
+    return (path.replace('$', '$$')
+                .replace(' ', '$ ')
+                .replace(':', '$:'))
+
+def escape_command(command):
+    """ninjaのcommandのescape
+    '$'は変数の参照となるため'$$'とする"""
+    return command.replace('$', '$$')
@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import os
 import os.path
 import pathlib
+import functools
+
+# 相対パスのcacheに保持する数
+#   上限を超えると最も古く使われたものから破棄される
+relative_cache_size = 1 << 16
 
 def relative_to(path, start= None):
     """startを基準としたpathの相対パスを返す"""
-    if start is None: start = os.path.curdir
+    path_string, start_string = absolute_pair(path, start)
     try:
-        return pathlib.Path(os.path.relpath(str(path), str(start)))
+        return relative_path(path_string, start_string)
     except ValueError as e:
         return path
 
@@ -18,7 +24,11 @@ def path_to_string(path, start= None):
     #    message = ('path_to_string(path, start= None):'
     #               'path<{0}> is not pathlib.Path'.format(repr(path)))
     #    raise ValueError(message)
-    return relative_to(path, start).as_posix()
+    path_string, start_string = absolute_pair(path, start)
+    try:
+        return relative_string(path_string, start_string)
+    except ValueError as e:
+        return pathlib.Path(path).as_posix()
 
 def print_path(path):
     """pathlib.Pathを相対化しposix形式で文字列化したものをprintする"""
@@ -28,3 +38,44 @@ def path_sort(path):
     """pathをdirectory, basenameの順でsortする"""
     return (path.parent, path)
 
+def absolute_pair(path, start):
+    """path, startを絶対パスの文字列にする
+    相対パスは現在のディレクトリを基準とする"""
+    path_string = str(path)
+    start_string = os.getcwd() if start is None else str(start)
+    if not os.path.isabs(path_string):
+        path_string = os.path.join(os.getcwd(), path_string)
+    if not os.path.isabs(start_string):
+        start_string = os.path.join(os.getcwd(), start_string)
+    return path_string, start_string
+
+@functools.lru_cache(maxsize= relative_cache_size)
+def split_path(path_string):
+    """絶対パスを正規化し、要素に分割する"""
+    return tuple(part for part in os.path.normpath(path_string).split(os.sep)
+                 if part)
+
+@functools.lru_cache(maxsize= relative_cache_size)
+def relative_string(path_string, start_string):
+    """start_stringを基準としたpath_stringの相対パスをposix形式で返す
+    pathlib.Pathを経由せず、分割した要素を比較して求める"""
+    if os.sep != '/' or not os.path.altsep is None:
+        return pathlib.Path(
+                    os.path.relpath(path_string, start_string)).as_posix()
+    path_part  = split_path(path_string)
+    start_part = split_path(start_string)
+    common = 0
+    for path_piece, start_piece in zip(path_part, start_part):
+        if path_piece != start_piece:
+            break
+        common += 1
+    relative_part = ((os.path.pardir,) * (len(start_part) - common)
+                     + path_part[common:])
+    if len(relative_part) == 0:
+        return os.path.curdir
+    return '/'.join(relative_part)
+
+@functools.lru_cache(maxsize= relative_cache_size)
+def relative_path(path_string, start_string):
+    """start_stringを基準としたpath_stringの相対パスをpathlib.Pathで返す"""
+    return pathlib.Path(relative_string(path_string, start_string))
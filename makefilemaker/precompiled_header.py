@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import enum
+from collections import namedtuple
+from .path_function import path_to_string, path_sort
+from .file_writer   import write_if_changed
+
+# 合成するヘッダファイルの名前
+header_name = 'makefilemaker_pch.h'
+# 合成するヘッダファイルのinclude guard
+include_guard_name = 'MAKEFILEMAKER_PCH_H'
+
+class PrecompiledHeaderScope(enum.Enum):
+    """プリコンパイル済みヘッダを共有する範囲
+    Project  : project全体で1つ
+    Directory: ソースコードのディレクトリ毎に1つ"""
+    Project   = 'project'
+    Directory = 'directory'
+
+class PrecompiledHeader(namedtuple('PrecompiledHeader',
+('header_path', 'include_files', 'depend_files', 'include_libs',
+ 'source_list',))):
+    """プリコンパイル済みヘッダ
+    header_path  : 合成するヘッダファイルのpath
+    include_files: 合成するヘッダファイルがincludeするヘッダファイル
+                     使用するソースコードの先頭のincludeと同じ順
+    depend_files : 合成するヘッダファイルが推移的に依存するファイル
+    include_libs : プリコンパイル時に使用するlibrary
+    source_list  : プリコンパイル済みヘッダを使用するソースコード"""
+    
+    @property
+    def gch_path(self):
+        """プリコンパイル済みヘッダのpath
+        -include で指定したヘッダファイルと同じディレクトリに置かれた
+        .gchをコンパイラは使用する"""
+        return self.header_path.with_name(self.header_path.name + '.gch')
+    
+    def make(self):
+        """ヘッダファイルを合成
+        return 書き込んだならばTrue"""
+        return write_if_changed(self.header_path,
+                                '\n'.join(self.make_code()) + '\n')
+    
+    def make_code(self):
+        """合成するヘッダファイルのコードを1行ずつ生成
+        プリコンパイル時は主ファイルとなるため、
+        #pragma onceではなくinclude guardを用いる"""
+        yield '// generated by makefilemaker'
+        yield '#ifndef {0}'.format(include_guard_name)
+        yield '#define {0}'.format(include_guard_name)
+        for include_file in self.include_files:
+            yield '#include "{0}"'.format(
+                        path_to_string(include_file, self.header_path.parent))
+        yield '#endif'
+    
+    def __str__(self):
+        piece = []
+        piece.append(self.__class__.__name__)
+        piece.append('header_path  :{0}'.format(
+                    path_to_string(self.header_path)))
+        piece.append('include_files:')
+        piece.extend('  {0}'.format(path_to_string(file))
+                     for file in self.include_files)
+        piece.append('include_libs :')
+        if len(self.include_libs) != 0:
+            piece.append('  {0}'.format(', '.join(self.include_libs)))
+        piece.append('source_list  :')
+        piece.extend('  {0}'.format(path_to_string(source))
+                     for source in self.source_list)
+        return '\n'.join(piece)
+
+def make_precompiled_header(self, build_data_list):
+    """ヘッダファイルの被依存数とparseのコストから
+    プリコンパイル済みヘッダを作成する
+    self           : MakefileMaker
+    build_data_list: {source_path: BuildData, ...}
+    return (PrecompiledHeader, ...)"""
+    count, scope = self._precompiled_header
+    # ソースコードをプリコンパイル済みヘッダを共有する範囲に分ける
+    group_list = {}
+    for source_path in sorted(build_data_list.keys(), key= path_sort):
+        if scope is PrecompiledHeaderScope.Directory:
+            header_dir = source_path.parent
+        else:
+            header_dir = self._root_path
+        group_list.setdefault(header_dir, []).append(source_path)
+    # 各範囲で候補を選択
+    cost_cache = {}
+    result = []
+    for header_dir in sorted(group_list.keys(), key= path_sort):
+        precompiled_header = select_header(
+                    self,
+                    header_dir.joinpath(header_name),
+                    [build_data_list[source]
+                     for source in group_list[header_dir]],
+                    count,
+                    cost_cache)
+        if not precompiled_header is None:
+            result.append(precompiled_header)
+            if self._option.verbose >= 1:# 表示
+                print(precompiled_header)
+                print()
+    return tuple(result)
+
+def select_header(self, header_path, build_data_list, count, cost_cache):
+    """プリコンパイル済みヘッダにするヘッダファイルを選択
+    -includeはソースコードより前にヘッダファイルをincludeするため、
+    ソースコードの先頭から続く #include "header" の並び(先頭のinclude)の
+    最初の要素のみを候補とし、被依存数 x parseのコストで選ぶ
+    それを使用するソースコード全てで先頭のincludeの次の要素が
+    同じならば、count個まで続けて追加する
+    self           : MakefileMaker
+    header_path    : 合成するヘッダファイルのpath
+    build_data_list: 範囲に含まれるソースコードのビルド情報
+    count          : 選択するヘッダファイルの上限
+    cost_cache     : ヘッダファイルのparseのコスト {header: cost, ...}
+    return PrecompiledHeader 候補が無ければNone"""
+    leading_list = dict(
+                (build_data.source_path,
+                 leading_include(self, build_data.source_path))
+                for build_data in build_data_list)
+    # 被依存数
+    #   先頭のincludeの最初の要素としてincludeされた数
+    fan_in = {}
+    for leading in leading_list.values():
+        if len(leading) != 0:
+            fan_in[leading[0]] = fan_in.get(leading[0], 0) + 1
+    candidate_list = sorted(
+                (header for header, number in fan_in.items()
+                 if number >= 2 and has_include_guard(header)),
+                key= lambda header: (-fan_in[header]
+                                     * parse_cost(self, header, cost_cache),
+                                     path_sort(header)))
+    if len(candidate_list) == 0:
+        return None
+    # 選択
+    selected_list = [candidate_list[0]]
+    target_list = [build_data for build_data in build_data_list
+                   if leading_list[build_data.source_path][:1]
+                      == (selected_list[0],)]
+    while len(selected_list) < count:
+        # 使用するソースコード全てで共通する次の要素
+        depth = len(selected_list)
+        next_set = set(leading_list[build_data.source_path][depth:depth + 1]
+                       for build_data in target_list)
+        if len(next_set) != 1:
+            break
+        next_header = next_set.pop()
+        if len(next_header) == 0 or not has_include_guard(next_header[0]):
+            break
+        selected_list.append(next_header[0])
+    depend_files = set(selected_list)
+    include_libs = set()
+    for header in selected_list:
+        dependence = self._code_manager.full_dependence(header)
+        depend_files.update(dependence.include_files)
+        include_libs.update(dependence.include_libs)
+    return PrecompiledHeader(
+                header_path,
+                tuple(selected_list),
+                tuple(sorted(depend_files, key= path_sort)),
+                tuple(sorted(include_libs)),
+                tuple(build_data.source_path for build_data in target_list))
+
+def leading_include(self, source_path):
+    """ソースコードの先頭から続く #include "header" の並び
+    空行, コメントのみを読み飛ばし、
+    それ以外のプリプロセッサ指令, コードが現れたら終わる
+    self       : MakefileMaker
+    source_path: ソースコードのpath
+    return (header_path, ...)"""
+    try:
+        with source_path.open(mode= 'rb') as source_file:
+            code = source_file.read()
+    except OSError:
+        return tuple()
+    result = []
+    position = 0
+    while True:
+        position = skip_regex.match(code, position).end()
+        match = leading_include_regex.match(code, position)
+        if match is None:
+            break
+        result.append(self._code_manager.resolve_include(
+                    source_path,
+                    match.group('header').decode('utf-8', 'surrogateescape')))
+        position = match.end()
+    return tuple(result)
+
+def parse_cost(self, header, cost_cache):
+    """ヘッダファイルのparseのコスト
+    推移的にincludeするファイルを含めた大きさ
+    include が深いほど大きくなる"""
+    if not header in cost_cache:
+        file_list = (header,) + self._code_manager.full_dependence(
+                    header).include_files
+        cost_cache[header] = sum(file_size(file) for file in file_list)
+    return cost_cache[header]
+
+def file_size(file_path):
+    """ファイルの大きさ 存在しなければ0"""
+    try:
+        return os.stat(str(file_path)).st_size
+    except OSError:
+        return 0
+
+def has_include_guard(header):
+    """ヘッダファイルがinclude guard, もしくは#pragma onceを持つか
+    プリコンパイル済みヘッダとソースコードから2回includeされても
+    問題が無いものに限る"""
+    try:
+        with header.open(mode= 'rb') as header_file:
+            code = header_file.read()
+    except OSError:
+        return False
+    return (not pragma_once_regex.search(code) is None
+            or not include_guard_regex.search(code) is None)
+
+# 空白, コメント
+skip_regex = re.compile(rb'(?:\s+|/\*.*?\*/|//[^\r\n]*)*', re.DOTALL)
+# #include "header" のみの行
+leading_include_regex = re.compile(
+            rb'#[ \t]*include[ \t]*"(?P<header>[^"\r\n]+)"'
+            rb'(?=[ \t]*(?:\r?\n|/[/*]|\Z))')
+# #pragma once
+pragma_once_regex = re.compile(
+            rb'^[ \t]*#[ \t]*pragma[ \t]+once\b', re.MULTILINE)
+# #ifndef NAME
+# #define NAME
+include_guard_regex = re.compile(
+            rb'^[ \t]*#[ \t]*ifndef[ \t]+(\w+)[ \t]*\r?\n'
+            rb'[ \t]*#[ \t]*define[ \t]+\1\b', re.MULTILINE)